@@ -0,0 +1,240 @@
+"""
+Benchmarks of metadata resolution and registry creation.
+
+The benchmarks run against a local mock InvenioRDM instance, see
+:mod:`benchmarks.server`. Run them from the root of the repository with::
+
+    python -m benchmarks --files 1 100 10000 100000 --latency 0.05
+
+The import time of the plugin is measured with ``python -m benchmarks --imports``.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+from pooch_invenio import InvenioRDMRepository, resolve_records
+from pooch_invenio.ratelimit import RequestScheduler, set_scheduler
+from pooch_invenio.repository import parse_archive_url
+
+from .imports import print_import_table, run_import_benchmarks
+from .server import MockInvenioRDMServer
+
+
+def measure(name: str, operation: Callable, server: MockInvenioRDMServer) -> dict:
+    """
+    Run an operation and measure its latency, requests and peak memory.
+
+    Tracing memory allocations slows down Python code considerably, so the
+    operation is run twice: once to measure time and requests and once to
+    measure the peak memory.
+    """
+    server.reset_stats()
+    start = time.perf_counter()
+    operation()
+    seconds = time.perf_counter() - start
+    stats = server.stats()
+
+    tracemalloc.start()
+    try:
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "operation": name,
+        "seconds": seconds,
+        "requests": stats.get("total", 0),
+        "rate_limited": stats.get("rate_limited", 0),
+        "peak_memory": peak,
+    }
+
+
+def benchmark_record(server: MockInvenioRDMServer, n_files: int) -> List[dict]:
+    """
+    Benchmark the operations of a single record with the given number of files.
+    """
+    doi = f"10.0000/bench.{n_files}"
+    archive_url = server.archive_url(n_files)
+    base_url, record_id = parse_archive_url(archive_url)
+    repository: Optional[InvenioRDMRepository] = None
+
+    def initialize():
+        nonlocal repository
+        repository = InvenioRDMRepository.initialize(doi, archive_url)
+        assert repository is not None
+
+    def download_urls():
+        for file_name in repository.record_files:
+            repository.download_url(file_name)
+
+    results = [
+        measure("initialize", initialize, server),
+        measure(
+            "record_files",
+            lambda: InvenioRDMRepository(doi, base_url, record_id).record_files,
+            server,
+        ),
+        measure("create_registry", lambda: repository.create_registry(), server),
+        measure("download_url", download_urls, server),
+        measure(
+            "licenses",
+            lambda: InvenioRDMRepository(doi, base_url, record_id).licenses(),
+            server,
+        ),
+    ]
+    for result in results:
+        result["files"] = n_files
+    return results
+
+
+def benchmark_throughput(
+    server: MockInvenioRDMServer, n_records: int, n_files: int, concurrency: int
+) -> dict:
+    """
+    Benchmark resolving many distinct records concurrently.
+
+    The records are prefetched, so that besides the probe every record costs
+    a request that is retried if it is rate-limited.
+    """
+    records = [
+        (f"10.0000/bench.{i}", server.archive_url(n_files, suffix=str(i)))
+        for i in range(n_records)
+    ]
+
+    def resolve():
+        failures = [
+            doi
+            for doi, result in resolve_records(
+                records, max_workers=concurrency, prefetch=True
+            ).items()
+            if not isinstance(result, InvenioRDMRepository)
+        ]
+        assert not failures, f"Failed to resolve {failures}"
+
+    result = measure("resolve_records", resolve, server)
+    result["files"] = n_files
+    result["records"] = n_records
+    result["records_per_second"] = n_records / result["seconds"]
+    return result
+
+
+def run_benchmarks(
+    files: List[int],
+    latency: float = 0.0,
+    rate_limit_every: int = 0,
+    page_size: Optional[int] = None,
+    records: int = 100,
+    concurrency: int = 16,
+) -> List[dict]:
+    """
+    Run all benchmarks against a freshly started mock server.
+    """
+    results = []
+    with MockInvenioRDMServer(
+        latency=latency, rate_limit_every=rate_limit_every, page_size=page_size
+    ) as server:
+        for n_files in files:
+            results.extend(benchmark_record(server, n_files))
+        if records:
+            results.append(benchmark_throughput(server, records, 10, concurrency))
+    return results
+
+
+def print_table(results: List[dict], file=sys.stdout):
+    """
+    Print benchmark results as a table.
+    """
+    header = f"{'operation':<16} {'files':>7} {'seconds':>9} {'requests':>8} {'429s':>5} {'peak MiB':>9}"
+    print(header, file=file)
+    print("-" * len(header), file=file)
+    for r in results:
+        line = (
+            f"{r['operation']:<16} {r['files']:>7} {r['seconds']:>9.4f} {r['requests']:>8} "
+            f"{r['rate_limited']:>5} {r['peak_memory'] / 2**20:>9.2f}"
+        )
+        if "records_per_second" in r:
+            line += f"  ({r['records']} records, {r['records_per_second']:.1f}/s)"
+        print(line, file=file)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark pooch-invenio against a local mock InvenioRDM instance.",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        nargs="+",
+        default=[1, 100, 10000, 100000],
+        help="The numbers of files of the benchmarked records.",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="The latency of every response."
+    )
+    parser.add_argument(
+        "--rate-limit-every",
+        type=int,
+        default=0,
+        help="Answer every n-th request except probes with status code 429.",
+    )
+    parser.add_argument(
+        "--page-size", type=int, help="Paginate files listings with this page size."
+    )
+    parser.add_argument(
+        "--records",
+        type=int,
+        default=100,
+        help="The number of records resolved in the throughput benchmark.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="The number of records resolved concurrently.",
+    )
+    parser.add_argument(
+        "--imports",
+        action="store_true",
+        help="Measure the import time of the plugin instead.",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON lines."
+    )
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        results = run_import_benchmarks()
+        if args.json:
+            for result in results:
+                print(json.dumps(result))
+        else:
+            print_import_table(results)
+        return 0
+
+    # Rate-limited requests are retried right away, the server asks for no delay
+    set_scheduler(RequestScheduler(backoff_factor=0.0))
+
+    results = run_benchmarks(
+        args.files,
+        latency=args.latency,
+        rate_limit_every=args.rate_limit_every,
+        page_size=args.page_size,
+        records=args.records,
+        concurrency=args.concurrency,
+    )
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+    else:
+        print_table(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Benchmarks of the import time of the plugin.
+
+pooch-doi loads all repository plugins to resolve a DOI, so the cost of
+importing the plugin is paid by every program that downloads data through
+pooch, whether or not the data is hosted on an InvenioRDM instance. Every
+scenario runs in a fresh interpreter, so that nothing is imported already.
+"""
+
+import json
+import subprocess
+import sys
+from typing import Dict, List
+
+# The modules that should only be imported once the plugin handles a DOI
+HEAVY_MODULES = ("requests", "pooch_doi.license")
+
+SCENARIOS: Dict[str, str] = {
+    "import": "import pooch_invenio",
+    "entry_points": (
+        "from pooch_invenio import (InvenioRDMRepository, "
+        "KnownInstancesInvenioRDMRepository, ZenodoRepository)"
+    ),
+    "non_matching": (
+        "from pooch_invenio import KnownInstancesInvenioRDMRepository\n"
+        "KnownInstancesInvenioRDMRepository.initialize("
+        "'10.0000/other', 'https://example.org/records/1')"
+    ),
+}
+
+_RUNNER = """
+import json, sys, time
+import pooch_doi.repository
+before = set(sys.modules)
+start = time.perf_counter()
+exec(compile({code!r}, "<scenario>", "exec"))
+seconds = time.perf_counter() - start
+imported = set(sys.modules) - before
+print(json.dumps({{
+    "seconds": seconds,
+    "modules": len(imported),
+    "heavy": sorted(m for m in {heavy!r} if m in imported),
+}}))
+"""
+
+
+def measure_import(name: str, code: str, repeat: int = 5) -> dict:
+    """
+    Measure the time a scenario takes in a fresh interpreter.
+
+    pooch-doi itself is imported before the measurement starts, it is loaded
+    anyway by the time the plugins are discovered. The fastest of the
+    repetitions is reported.
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _RUNNER.format(code=code, heavy=HEAVY_MODULES)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        runs.append(json.loads(output))
+    result = min(runs, key=lambda run: run["seconds"])
+    result["scenario"] = name
+    return result
+
+
+def run_import_benchmarks(repeat: int = 5) -> List[dict]:
+    """
+    Measure all import scenarios.
+    """
+    return [measure_import(name, code, repeat) for name, code in SCENARIOS.items()]
+
+
+def print_import_table(results: List[dict], file=sys.stdout):
+    """
+    Print import benchmark results as a table.
+    """
+    header = f"{'scenario':<16} {'milliseconds':>12} {'modules':>8}  heavy modules"
+    print(header, file=file)
+    print("-" * len(header), file=file)
+    for r in results:
+        print(
+            f"{r['scenario']:<16} {r['seconds'] * 1000:>12.2f} {r['modules']:>8}  "
+            f"{', '.join(r['heavy']) or '-'}",
+            file=file,
+        )
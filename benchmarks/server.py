@@ -0,0 +1,272 @@
+"""
+A local stand-in for an InvenioRDM instance.
+
+Records are synthesized on the fly: the record ``<n>`` or ``<n>-<suffix>``
+has ``n`` files. The server runs in a separate process, so that it neither
+competes with the benchmarked code for the GIL nor shows up in its memory
+measurements.
+"""
+
+import collections
+import functools
+import hashlib
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+RIGHTS = [
+    {
+        "id": "cc-by-4.0",
+        "title": {"en": "Creative Commons Attribution 4.0 International"},
+        "description": {"en": "The Creative Commons Attribution license."},
+        "props": {"url": "https://creativecommons.org/licenses/by/4.0/legalcode"},
+    }
+]
+
+
+def _content(key: str) -> bytes:
+    return f"content of {key}\n".encode()
+
+
+def _entry(base_url: str, record_id: str, index: int) -> dict:
+    key = f"file-{index:06d}.dat"
+    content = _content(key)
+    url = f"{base_url}/api/records/{record_id}/files/{key}"
+    return {
+        "key": key,
+        "checksum": f"md5:{hashlib.md5(content).hexdigest()}",
+        "size": len(content),
+        "mimetype": "application/octet-stream",
+        "status": "completed",
+        "links": {"self": url, "content": f"{url}/content"},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Headers and body are written separately, which would otherwise stall
+    # every keep-alive response on delayed acknowledgements
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, status: int, body: bytes, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data, headers: Optional[dict] = None):
+        self._send(
+            status,
+            json.dumps(data).encode(),
+            {"Content-Type": "application/json", **(headers or dict())},
+        )
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        server = self.server
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+
+        if url.path == "/_stats":
+            with server.lock:
+                return self._send_json(200, dict(server.stats))
+        if url.path == "/_reset":
+            with server.lock:
+                server.stats.clear()
+            return self._send_json(200, dict())
+
+        # Classify the request by endpoint
+        if parts[:2] != ["api", "records"] or len(parts) < 3:
+            kind = "other"
+        elif len(parts) == 3:
+            kind = "details"
+        elif parts[3:] == ["files"]:
+            kind = "files"
+        elif parts[3:] == ["files-archive"]:
+            kind = "archive"
+        elif len(parts) == 6 and parts[3] == "files" and parts[5] == "content":
+            kind = "content"
+        else:
+            kind = "other"
+
+        # The first page of the files listing doubles as the probe, which is
+        # never retried, so it is not rate-limited. The other requests are
+        # counted across resets of the statistics, so that every n-th of them
+        # is rate-limited however the measured operations are cut.
+        first_page = kind == "files" and "page" not in url.query
+        rate_limited = False
+        with server.lock:
+            server.stats[kind] += 1
+            server.stats["total"] += 1
+            if server.rate_limit_every and not first_page:
+                server.limited_requests += 1
+                if server.limited_requests % server.rate_limit_every == 0:
+                    server.stats["rate_limited"] += 1
+                    rate_limited = True
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if rate_limited:
+            return self._send_json(
+                429,
+                {"status": 429, "message": "Too many requests."},
+                {"Retry-After": "0"},
+            )
+
+        try:
+            n_files = int(parts[2].split("-")[0])
+        except (IndexError, ValueError):
+            kind = "other"
+
+        if kind == "files":
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            return self._send(
+                200,
+                server.listing(parts[2], n_files, page),
+                {"Content-Type": "application/json"},
+            )
+        if kind == "details":
+            return self._send_json(200, server.details(parts[2], n_files))
+        if kind == "content":
+            return self._send(200, _content(parts[4]))
+        return self._send_json(404, {"status": 404, "message": "Not found."})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, rate_limit_every, page_size, embed_limit):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.page_size = page_size
+        self.embed_limit = embed_limit
+        self.stats: Dict[str, int] = collections.Counter()
+        self.limited_requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients close streamed responses early, e.g. the record details once
+        # the metadata was read, which is not an error of the server
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @functools.lru_cache(maxsize=64)
+    def listing(self, record_id: str, n_files: int, page: int) -> bytes:
+        size = self.page_size or max(n_files, 1)
+        start = (page - 1) * size
+        listing = {
+            "enabled": True,
+            "entries": [
+                _entry(self.base_url, record_id, i)
+                for i in range(start, min(start + size, n_files))
+            ],
+            "links": {
+                "self": f"{self.base_url}/api/records/{record_id}/files",
+                "archive": f"{self.base_url}/api/records/{record_id}/files-archive",
+            },
+        }
+        if start + size < n_files:
+            listing["links"][
+                "next"
+            ] = f"{self.base_url}/api/records/{record_id}/files?page={page + 1}"
+        return json.dumps(listing).encode()
+
+    def details(self, record_id: str, n_files: int) -> dict:
+        details = {
+            "id": record_id,
+            "pids": {"doi": {"identifier": f"10.0000/bench.{record_id}"}},
+            "metadata": {"title": f"Record {record_id}", "rights": RIGHTS},
+            "files": {"enabled": True, "count": n_files},
+        }
+        if n_files <= self.embed_limit:
+            details["files"]["entries"] = {
+                entry["key"]: entry
+                for entry in (
+                    _entry(self.base_url, record_id, i) for i in range(n_files)
+                )
+            }
+        return details
+
+
+def _serve(queue, latency, rate_limit_every, page_size, embed_limit):
+    server = _Server(latency, rate_limit_every, page_size, embed_limit)
+    queue.put(server.base_url)
+    server.serve_forever()
+
+
+class MockInvenioRDMServer:
+    """
+    A local InvenioRDM instance serving synthetic records.
+
+    Parameters
+    ----------
+    latency : float
+        The time in seconds every response is delayed by.
+    rate_limit_every : int
+        If set, every n-th request is answered with status code 429. Probes,
+        i.e. first pages of files listings, are neither counted nor limited.
+    page_size : int, optional
+        The number of file entries per page of the files listing. By default,
+        the listing is not paginated.
+    embed_limit : int
+        The maximum number of file entries embedded in the record details.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        rate_limit_every: int = 0,
+        page_size: Optional[int] = None,
+        embed_limit: int = 1000,
+    ):
+        self.options = (latency, rate_limit_every, page_size, embed_limit)
+        self.base_url: Optional[str] = None
+        self._process = None
+
+    def __enter__(self):
+        queue = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(queue, *self.options), daemon=True
+        )
+        self._process.start()
+        self.base_url = queue.get(timeout=30)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._process.terminate()
+        self._process.join()
+
+    def archive_url(self, n_files: int, suffix: str = "") -> str:
+        """
+        The archive URL of a record with the given number of files.
+        """
+        record_id = f"{n_files}-{suffix}" if suffix else str(n_files)
+        return f"{self.base_url}/records/{record_id}"
+
+    def stats(self) -> Dict[str, int]:
+        """
+        The number of requests received so far, by endpoint.
+        """
+        with urllib.request.urlopen(f"{self.base_url}/_stats") as response:
+            return json.load(response)
+
+    def reset_stats(self):
+        """
+        Reset the request counters.
+        """
+        urllib.request.urlopen(f"{self.base_url}/_reset").close()
@@ -1,7 +1,41 @@
 # The version file is generated automatically by setuptools_scm
 from ._version import version as __version__
-from .repository import (
-    InvenioRDMRepository,
-    KnownInstancesInvenioRDMRepository,
-    ZenodoRepository,
-)
+
+# The public API is imported on first access, so that the discovery of the
+# repository plugins of pooch-doi only loads the modules it actually needs.
+_LAZY_IMPORTS = {
+    "batch": ("plan_downloads", "resolve_records", "scan_licenses"),
+    "cache": ("MetadataCache", "MetadataSnapshot", "ProbeCache"),
+    "coalesce": ("RequestCoalescer", "get_coalescer", "set_coalescer"),
+    "download": ("DownloadPlan",),
+    "http": ("configure_session", "get_session", "set_session"),
+    "instances": ("register_instance",),
+    "metrics": ("Metrics", "add_hook", "remove_hook"),
+    "ratelimit": ("RequestScheduler", "get_scheduler", "set_scheduler"),
+    "repository": (
+        "InvenioRDMRepository",
+        "KnownInstancesInvenioRDMRepository",
+        "ZenodoRepository",
+    ),
+    "snapshot": ("disable_offline_mode", "enable_offline_mode", "export_snapshot"),
+    "store": ("ContentStore",),
+}
+
+_MODULES = {name: module for module, names in _LAZY_IMPORTS.items() for name in names}
+
+__all__ = ["__version__", *_MODULES]
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib  # pylint: disable=C0415
+
+    value = getattr(importlib.import_module(f".{_MODULES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(__all__)
@@ -0,0 +1,125 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+
+def _read_records(args) -> list:
+    # Records are given as DOIs, optionally followed by the resolved archive URL
+    lines = list(args.records)
+    if args.file is not None:
+        with open(args.file, encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+
+    records = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 1:
+            records.append(parts[0])
+        elif len(parts) == 2:
+            records.append(tuple(parts))
+    return records
+
+
+def _add_records_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "records",
+        nargs="*",
+        help="DOIs of the records, optionally followed by the archive URL",
+    )
+    parser.add_argument(
+        "-f",
+        "--file",
+        help="A file with one record per line, given as DOI and optional archive URL",
+    )
+
+
+def _snapshot(args) -> int:
+    from .snapshot import export_snapshot  # pylint: disable=C0415
+
+    failures = export_snapshot(_read_records(args), args.output)
+    for doi, error in failures.items():
+        reason = "not an InvenioRDM record" if error is None else repr(error)
+        print(f"Could not export {doi}: {reason}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def _licenses(args) -> int:
+    from .batch import scan_licenses  # pylint: disable=C0415
+
+    records = _read_records(args)
+    if args.instance is not None:
+        # Bare record IDs refer to the given instance, DOIs always contain a slash
+        base_url = args.instance.rstrip("/")
+        records = [
+            f"{base_url}/records/{r}" if isinstance(r, str) and "/" not in r else r
+            for r in records
+        ]
+
+    output = (
+        sys.stdout if args.output is None else open(args.output, "w", encoding="utf-8")
+    )
+    limits = {
+        name: getattr(args, name)
+        for name in ("max_workers", "max_per_host")
+        if getattr(args, name) is not None
+    }
+    failed = False
+    try:
+        for result in scan_licenses(records, **limits):
+            failed = failed or "error" in result
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="pooch-invenio",
+        description="Tools for working with records of InvenioRDM instances",
+    )
+    subparsers = parser.add_subparsers(required=True)
+
+    snapshot = subparsers.add_parser(
+        "snapshot",
+        help="Export record metadata into a snapshot file for offline use",
+    )
+    _add_records_arguments(snapshot)
+    snapshot.add_argument(
+        "-o", "--output", required=True, help="The snapshot file to write"
+    )
+    snapshot.set_defaults(func=_snapshot)
+
+    licenses = subparsers.add_parser(
+        "licenses",
+        help="Scan the licenses of records and write them as JSON lines",
+    )
+    _add_records_arguments(licenses)
+    licenses.add_argument(
+        "-o", "--output", help="The file to write to instead of standard output"
+    )
+    licenses.add_argument(
+        "--instance",
+        help="The base URL of the InvenioRDM instance that bare record IDs refer to",
+    )
+    licenses.add_argument(
+        "--max-workers",
+        type=int,
+        help="The maximum number of records scanned concurrently",
+    )
+    licenses.add_argument(
+        "--max-per-host",
+        type=int,
+        help="The maximum number of records scanned concurrently per host",
+    )
+    licenses.set_defaults(func=_licenses)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+An asyncio-native variant of the InvenioRDM repository.
+
+This module requires the optional dependency ``httpx``, which can be installed
+with ``python -m pip install pooch_invenio[async]``.
+"""
+
+import asyncio
+import time
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from pooch_doi.repository import DEFAULT_TIMEOUT
+
+from .files import CHUNK_SIZE, FileEntry, FilesListingParser
+from .metrics import emit, endpoint_type, instrumented
+from .ratelimit import TokenBucket, get_scheduler, parse_rate_limit_headers
+from .repository import InvenioRDMRepository, USER_AGENT, parse_archive_url
+
+# The maximum number of connections kept alive per event loop
+DEFAULT_MAX_CONNECTIONS = 100
+
+# The maximum number of concurrent requests per host and event loop
+DEFAULT_MAX_PER_HOST = 4
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = (
+    weakref.WeakKeyDictionary()
+)
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client():
+    """
+    Get the shared async HTTP client of the running event loop.
+
+    The client pools connections across all requests issued from the same
+    event loop.
+
+    Returns
+    -------
+    client : httpx.AsyncClient
+        The shared client.
+    """
+    import httpx  # pylint: disable=C0415
+
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=DEFAULT_MAX_CONNECTIONS),
+            follow_redirects=True,
+        )
+    return _clients[loop]
+
+
+def host_semaphore(host: str) -> asyncio.Semaphore:
+    """
+    Get the semaphore that limits the concurrent requests to a host.
+
+    The semaphore is shared by all requests issued from the running event loop
+    and allows at most ``DEFAULT_MAX_PER_HOST`` concurrent requests.
+    """
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), dict())
+    if host not in semaphores:
+        semaphores[host] = asyncio.Semaphore(DEFAULT_MAX_PER_HOST)
+    return semaphores[host]
+
+
+async def acquire_token(bucket: TokenBucket):
+    """
+    Take a token from a token bucket without blocking the event loop.
+
+    The buckets are those of the shared request scheduler, so synchronous and
+    asynchronous requests to a host count against the same budget.
+    """
+    while True:
+        wait = bucket.try_acquire()
+        if wait == 0.0:
+            return
+        await asyncio.sleep(wait)
+
+
+class AsyncInvenioRDMRepository:
+    """
+    An asyncio-native counterpart of :class:`InvenioRDMRepository`.
+
+    Parameters
+    ----------
+    doi : str
+        The DOI that identifies the record.
+    base_url : str
+        The base URL of the InvenioRDM instance.
+    record_id : str
+        The ID of the record.
+    client : httpx.AsyncClient, optional
+        The HTTP client to use. Defaults to a client shared across the
+        running event loop.
+    """
+
+    def __init__(self, doi: str, base_url: str, record_id: str, client=None):
+        self.doi = doi
+        self.base_url = base_url
+        self.record_id = record_id
+        self.archive_url = f"{base_url}/records/{record_id}"
+        self._client = client
+        self._record_files: Optional[Dict[str, FileEntry]] = None
+        self._record_details: Optional[dict] = None
+
+    @classmethod
+    async def initialize(cls, doi: str, archive_url: str, client=None):
+        """
+        Initialize the repository if the given URL points to an InvenioRDM record.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI that identifies the repository
+        archive_url : str
+            The resolved URL for the DOI
+        client : httpx.AsyncClient, optional
+            The HTTP client to use.
+
+        Returns
+        -------
+        repository : AsyncInvenioRDMRepository or None
+            The initialized repository or ``None`` if this is not an InvenioRDM
+            record.
+        """
+        parsed = parse_archive_url(archive_url)
+        if parsed is None:
+            return None
+        base_url, record_id = parsed
+
+        repository = cls(doi, base_url, record_id, client=client)
+
+        # The snapshot and the offline mode of the synchronous repository apply
+        snapshot = InvenioRDMRepository.metadata_snapshot
+        if snapshot is not None:
+            record_files = snapshot.get(base_url, record_id, "files")
+            emit("cache", layer="snapshot", kind="files", hit=record_files is not None)
+            if record_files is not None:
+                repository._record_files = record_files
+                return repository
+        if InvenioRDMRepository.offline:
+            return None
+
+        # We don't retry rate-limited requests here because this might not be
+        # an InvenioRDM instance
+        response = await repository._request(
+            f"{base_url}/api/records/{record_id}/files",
+            headers={"Accept": "application/json"},
+            check_rate_limit=False,
+            stream=True,
+        )
+
+        # If we failed, this is probably not an InvenioRDM instance
+        if 400 <= response.status_code < 600:
+            await response.aclose()
+            return None
+
+        repository._record_files = await repository._read_record_files(response)
+        return repository
+
+    async def _request(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        check_rate_limit: bool = True,
+        stream: bool = False,
+    ):
+        client = self._client if self._client is not None else get_async_client()
+        scheduler = get_scheduler()
+
+        host = urlsplit(url).netloc
+        endpoint = endpoint_type(url)
+        if endpoint == "files" and not check_rate_limit:
+            endpoint = "probe"
+
+        bucket = scheduler.bucket(host)
+
+        attempt = 0
+        while True:
+            await acquire_token(bucket)
+            async with host_semaphore(host):
+                start = time.perf_counter()
+                response = await client.send(
+                    client.build_request("GET", url, headers=headers), stream=stream
+                )
+            if instrumented():
+                emit(
+                    "request",
+                    endpoint=endpoint,
+                    url=url,
+                    host=host,
+                    status=response.status_code,
+                    seconds=time.perf_counter() - start,
+                )
+
+            remaining, reset = parse_rate_limit_headers(response.headers)
+            if remaining is not None:
+                bucket.update(remaining, reset)
+
+            if response.status_code != 429:
+                return response
+            if not check_rate_limit:
+                emit("rate_limited", url=url, host=host, delay=None)
+                return response
+            await response.aclose()
+            if attempt >= scheduler.max_retries:
+                emit("rate_limited", url=url, host=host, delay=None)
+                raise RuntimeError(
+                    f"The request to '{url}' returned with status code {response.status_code!s}."
+                    f"This means you are probably rate-limited. Please try again in a few minutes."
+                )
+
+            scheduler.retry_delay(url, response, attempt)
+            attempt += 1
+
+    def _from_snapshot(self, kind: str):
+        # Returns the metadata from the snapshot, or None if it has to be requested
+        snapshot = InvenioRDMRepository.metadata_snapshot
+        if snapshot is not None:
+            data = snapshot.get(self.base_url, self.record_id, kind)
+            emit("cache", layer="snapshot", kind=kind, hit=data is not None)
+            if data is not None:
+                return data
+        if InvenioRDMRepository.offline:
+            raise RuntimeError(
+                f"The metadata of record '{self.archive_url}' (doi:{self.doi}) is not "
+                f"available in offline mode. Please add it to the metadata snapshot."
+            )
+        return None
+
+    async def _read_record_files(self, response) -> Dict[str, FileEntry]:
+        # The files listing is parsed incrementally, following pagination links
+        entries = dict()
+        while True:
+            # An error document must never be mistaken for a listing without files
+            if not response.is_success:
+                await response.aclose()
+                raise RuntimeError(
+                    f"The request to '{response.url}' returned with status code {response.status_code!s}."
+                )
+            parser = FilesListingParser(entries)
+            try:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    parser.feed(chunk)
+            finally:
+                await response.aclose()
+            parser.close()
+
+            next_url = parser.fields.get("links", dict()).get("next")
+            if next_url is None:
+                return entries
+            response = await self._request(
+                next_url, headers={"Accept": "application/json"}, stream=True
+            )
+
+    async def record_files(self) -> Dict[str, FileEntry]:
+        """
+        The file entries of the record, keyed by file name.
+        """
+        if self._record_files is None:
+            self._record_files = self._from_snapshot("files")
+        if self._record_files is None:
+            response = await self._request(
+                f"{self.base_url}/api/records/{self.record_id}/files",
+                headers={"Accept": "application/json"},
+                stream=True,
+            )
+            self._record_files = await self._read_record_files(response)
+        return self._record_files
+
+    async def record_details(self) -> dict:
+        """
+        The full record in the InvenioRDM serialization.
+        """
+        if self._record_details is None:
+            self._record_details = self._from_snapshot("details")
+        if self._record_details is None:
+            url = f"{self.base_url}/api/records/{self.record_id}"
+            response = await self._request(
+                url, headers={"Accept": "application/vnd.inveniordm.v1+json"}
+            )
+            try:
+                self._record_details = response.json()
+            except ValueError:
+                raise RuntimeError(
+                    f"An issue occurred decoding the JSON response from '{url}'."
+                    f"This should not happen."
+                    f"Please open an issue at https://github.com/ssciwr/pooch-invenio/issues"
+                )
+        return self._record_details
+
+    async def licenses(self):
+        """
+        The licenses of the record.
+        """
+        return InvenioRDMRepository._licenses_from_record_details(
+            await self.record_details()
+        )
+
+    async def download_url(self, file_name: str) -> str:
+        """
+        Get the download URL for a file in the record.
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the file in the archive that will be downloaded.
+
+        Returns
+        -------
+        download_url : str
+            The HTTP URL that can be used to download the file.
+        """
+        record_files = await self.record_files()
+        if file_name not in record_files:
+            raise ValueError(
+                f"File '{file_name}' not found in data archive "
+                f"{self.archive_url} (doi:{self.doi})."
+            )
+        content_url = record_files[file_name].content_url
+        if content_url is None:
+            raise KeyError("content")
+        return content_url
+
+    async def create_registry(self) -> Dict[str, str]:
+        """
+        Create a registry dictionary using the repository's API.
+
+        Returns
+        ----------
+        registry : Dict[str,str]
+            The registry dictionary.
+        """
+        registry = dict()
+        for key, entry in (await self.record_files()).items():
+            if entry.checksum is None:
+                raise KeyError("checksum")
+            registry[key] = entry.checksum
+        return registry
@@ -0,0 +1,219 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Type, Union
+
+from .download import DownloadPlan, check_free_space, default_download_dir
+from .ratelimit import HostConcurrencyLimiter
+from .repository import InvenioRDMRepository, parse_archive_url
+
+# The default maximum number of concurrent operations across all hosts
+DEFAULT_MAX_WORKERS = 32
+
+# The default maximum number of concurrent operations per host
+DEFAULT_MAX_PER_HOST = 4
+
+# The number of records that are queued for a license scan per worker
+_SCAN_BACKLOG = 4
+
+
+def resolve_records(
+    records: Iterable[Tuple[str, str]],
+    repository_class: Type[InvenioRDMRepository] = InvenioRDMRepository,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+    prefetch: bool = False,
+) -> Dict[str, Union[InvenioRDMRepository, Exception, None]]:
+    """
+    Resolve many records concurrently.
+
+    For every record, the repository is initialized and its files listing
+    is fetched. The records are processed on a bounded thread pool, with at
+    most ``max_per_host`` records being resolved against the same host at
+    any time.
+
+    Parameters
+    ----------
+    records : Iterable[Tuple[str, str]]
+        Pairs of DOI and resolved archive URL.
+    repository_class : Type[InvenioRDMRepository]
+        The repository class used to initialize the records.
+    max_workers : int
+        The maximum number of records resolved concurrently.
+    max_per_host : int
+        The maximum number of records resolved concurrently per host.
+    prefetch : bool
+        Whether the record details are fetched in addition to the files listing.
+
+    Returns
+    -------
+    repositories : Dict[str, Union[InvenioRDMRepository, Exception, None]]
+        A mapping from DOI to the initialized repository. If the archive URL
+        is not handled by the repository class, the value is ``None``. If an
+        error occurred, the value is the raised exception.
+    """
+    limiter = HostConcurrencyLimiter(max_per_host)
+
+    def resolve(doi: str, archive_url: str) -> Optional[InvenioRDMRepository]:
+        with limiter(archive_url):
+            repository = repository_class.initialize(doi, archive_url)
+            if repository is not None and prefetch:
+                repository.prefetch()
+            if repository is not None:
+                repository.record_files
+            return repository
+
+    records = list(records)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            doi: executor.submit(resolve, doi, archive_url)
+            for doi, archive_url in records
+        }
+
+    result = {}
+    for doi, future in futures.items():
+        try:
+            result[doi] = future.result()
+        except Exception as e:  # pylint: disable=broad-except
+            result[doi] = e
+    return result
+
+
+def plan_downloads(
+    repositories: Iterable[InvenioRDMRepository],
+    path: Optional[Union[str, os.PathLike]] = None,
+    check_space: bool = True,
+) -> Dict[str, DownloadPlan]:
+    """
+    Plan the download of all files of many records.
+
+    Parameters
+    ----------
+    repositories : Iterable[InvenioRDMRepository]
+        The initialized repositories of the records, e.g. as returned by
+        :func:`resolve_records`.
+    path : str or PathLike, optional
+        The directory to create the download directories of the records in.
+        Defaults to the pooch cache directory.
+    check_space : bool
+        Whether to check that all downloads fit on the disks together.
+
+    Returns
+    -------
+    plans : Dict[str, DownloadPlan]
+        A mapping from DOI to the download plan of the record.
+
+    Raises
+    ------
+    RuntimeError
+        If ``check_space`` is set and there is not enough free space.
+    """
+    plans = {
+        repository.doi: repository.download_plan(
+            default_download_dir(repository.doi, path)
+        )
+        for repository in repositories
+    }
+    if check_space:
+        check_free_space(plans.values())
+    return plans
+
+
+def license_to_json(license) -> Dict[str, Any]:
+    """
+    Convert a license into a JSON-compatible dictionary.
+    """
+    return {
+        "name": license.name,
+        "description": license.description,
+        "copyright": license.copyright,
+        "identifiers": [
+            {"scheme": identifier.scheme.value, "value": identifier.value}
+            for identifier in license.identifiers
+        ],
+        "references": [
+            {"role": reference.role.value, "uri": reference.uri}
+            for reference in license.references
+        ],
+    }
+
+
+def scan_licenses(
+    records: Iterable[Union[str, Tuple[str, str]]],
+    repository_class: Type[InvenioRDMRepository] = InvenioRDMRepository,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Scan the licenses of many records concurrently.
+
+    Only the rights of the records are fetched, see
+    :meth:`InvenioRDMRepository.licenses`. The records are not probed, the
+    request for their rights already fails for anything but an InvenioRDM
+    record. Rate-limited requests are retried by the shared request scheduler
+    and at most ``max_per_host`` records are scanned against the same host at
+    any time. The records are consumed lazily, so that arbitrarily many
+    records can be scanned with bounded memory.
+
+    Parameters
+    ----------
+    records : Iterable[Union[str, Tuple[str, str]]]
+        The records to scan, either given as DOI, as archive URL of the form
+        ``<base_url>/records/<record_id>`` or as pair of DOI and archive URL.
+    repository_class : Type[InvenioRDMRepository]
+        The repository class used to fetch the records.
+    max_workers : int
+        The maximum number of records scanned concurrently.
+    max_per_host : int
+        The maximum number of records scanned concurrently per host.
+
+    Yields
+    ------
+    result : Dict[str, Any]
+        The result of a record as soon as it is scanned, with the keys
+        ``record`` (the record as given), ``doi``, ``archive_url`` and either
+        ``licenses`` (a list of licenses converted with
+        :func:`license_to_json`) or ``error``.
+    """
+    limiter = HostConcurrencyLimiter(max_per_host)
+
+    def scan(record: Union[str, Tuple[str, str]]) -> Dict[str, Any]:
+        if isinstance(record, str):
+            doi, archive_url = (None, record) if "://" in record else (record, None)
+        else:
+            doi, archive_url = record
+        result = {
+            "record": record if isinstance(record, str) else doi,
+            "doi": doi,
+            "archive_url": archive_url,
+        }
+        try:
+            if archive_url is None:
+                from .snapshot import resolve_doi  # pylint: disable=C0415
+
+                with limiter("https://doi.org"):
+                    archive_url = result["archive_url"] = resolve_doi(doi)
+
+            parsed = parse_archive_url(archive_url)
+            if parsed is None:
+                result["error"] = "Not an InvenioRDM record."
+                return result
+
+            with limiter(archive_url):
+                repository = repository_class(doi, *parsed)
+                result["licenses"] = [license_to_json(l) for l in repository.licenses()]
+        except Exception as e:  # pylint: disable=broad-except
+            result["error"] = repr(e)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for record in records:
+            pending.add(executor.submit(scan, record))
+            if len(pending) >= _SCAN_BACKLOG * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
@@ -0,0 +1,520 @@
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+from urllib.parse import quote
+
+from .files import FileEntry, index_from_json, index_to_json
+from .ratelimit import get_scheduler
+from .rights import record_rights
+
+# The version of the metadata snapshot file format
+SNAPSHOT_FORMAT_VERSION = 1
+
+# The default time in seconds after which probe verdicts are checked again
+DEFAULT_PROBE_TTL = 7 * 24 * 60 * 60
+
+# The default time in seconds to wait for a lock. Locks of cache entries are
+# additionally held through the retries of rate-limited requests.
+DEFAULT_LOCK_TIMEOUT = 60.0
+
+# The time in seconds after which a lock file is considered abandoned
+DEFAULT_LOCK_STALE = 600.0
+
+
+def default_cache_dir() -> Path:
+    """
+    The default location of the metadata cache.
+
+    The cache lives next to the pooch cache directory of the operating system,
+    e.g. ``~/.cache/pooch-invenio`` on Linux.
+    """
+    import pooch  # pylint: disable=C0415
+
+    return Path(pooch.os_cache("pooch-invenio")) / "metadata"
+
+
+def _write_json_atomically(path: Path, data: Any):
+    # The data is written to a temporary file first and then moved into place,
+    # so that readers never see a partially written file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def response_validators(headers: Mapping[str, str]) -> Dict[str, str]:
+    """
+    Extract the validators of a response that allow to revalidate it later.
+    """
+    return {k: headers[k] for k in ("ETag", "Last-Modified") if k in headers}
+
+
+def conditional_headers(validators: Mapping[str, str]) -> Dict[str, str]:
+    """
+    Build the headers of a conditional request from the stored validators.
+    """
+    headers = {}
+    if "ETag" in validators:
+        headers["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        headers["If-Modified-Since"] = validators["Last-Modified"]
+    return headers
+
+
+class FileLock:
+    """
+    An inter-process lock based on the exclusive creation of a lock file.
+
+    Unlike advisory locks, exclusively creating a file is atomic on local file
+    systems as well as on NFS, so the lock also works between machines that
+    share a cache directory. While the lock is held, the modification time of
+    the lock file is refreshed regularly. Lock files left behind by crashed
+    processes are removed once they were not refreshed for ``stale`` seconds.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The lock file.
+    timeout : float
+        The time in seconds to wait for the lock. If it is exceeded, the
+        context manager is entered without holding the lock, so that a hanging
+        process never blocks the others forever.
+    stale : float
+        The age in seconds after which a lock file is considered abandoned.
+    poll_interval : float
+        The time in seconds between two attempts to acquire the lock.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        timeout: float = DEFAULT_LOCK_TIMEOUT,
+        stale: float = DEFAULT_LOCK_STALE,
+        poll_interval: float = 0.1,
+    ):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.stale = stale
+        self.poll_interval = poll_interval
+        self.held = False
+        self._identity: Optional[Tuple[int, int]] = None
+        self._heartbeat: Optional[threading.Event] = None
+
+    def acquire(self) -> bool:
+        """
+        Acquire the lock.
+
+        Returns
+        -------
+        held : bool
+            Whether the lock was acquired before the timeout.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    stat = self.path.stat()
+                    if time.time() - stat.st_mtime > self.stale:
+                        self._break(stat)
+                        continue
+                except OSError:
+                    # The lock was released in the meantime
+                    continue
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(self.poll_interval)
+            else:
+                import socket  # pylint: disable=C0415
+
+                with os.fdopen(fd, "w") as f:
+                    f.write(f"{os.getpid()}@{socket.gethostname()}")
+                    stat = os.fstat(f.fileno())
+                self._identity = (stat.st_ino, stat.st_mtime_ns)
+                self.held = True
+                self._start_heartbeat()
+                return True
+
+    def _break(self, stale: os.stat_result):
+        # Several processes might find the same abandoned lock file, and one of
+        # them might already have replaced it with its own lock. Moving the file
+        # aside is atomic, so we can check that we got the abandoned one.
+        aside = self.path.with_name(f"{self.path.name}.{os.getpid()}.stale")
+        os.replace(self.path, aside)
+        try:
+            moved = aside.stat()
+            if (moved.st_ino, moved.st_mtime_ns) != (stale.st_ino, stale.st_mtime_ns):
+                # We took a fresh lock, put it back unless it was replaced already
+                try:
+                    os.link(aside, self.path)
+                except FileExistsError:
+                    pass
+        finally:
+            aside.unlink()
+
+    def _start_heartbeat(self):
+        stop = self._heartbeat = threading.Event()
+        path = self.path
+
+        def refresh():
+            while not stop.wait(self.stale / 4):
+                try:
+                    os.utime(path)
+                except OSError:
+                    return
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def release(self):
+        """
+        Release the lock if it is held.
+        """
+        if self.held:
+            self._heartbeat.set()
+            try:
+                # Never remove a lock that another process took over
+                if self.path.stat().st_ino == self._identity[0]:
+                    self.path.unlink()
+            except OSError:
+                pass
+            self.held = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """
+    An entry of the metadata cache, including expired entries.
+    """
+
+    data: Any
+    validators: Dict[str, str]
+    fresh: bool
+
+
+class MetadataCache:
+    """
+    A persistent on-disk cache for InvenioRDM record metadata.
+
+    Entries are keyed by the base URL of the InvenioRDM instance, the record ID
+    and the kind of metadata (e.g. ``"files"`` or ``"details"``). Published
+    InvenioRDM records are immutable, so by default entries never expire.
+
+    The cache can be shared between processes and machines, e.g. on a network
+    file system. Entries are written atomically and :meth:`lock` allows to
+    fetch an entry only once while other processes wait for the result.
+
+    Parameters
+    ----------
+    path : str or PathLike, optional
+        The directory to store the cache in. Defaults to a directory next to
+        the pooch cache directory.
+    ttl : float, optional
+        The time in seconds after which a cache entry is considered stale.
+        If ``None`` (the default), entries never expire.
+    lock_timeout : float, optional
+        The maximum time in seconds to wait for another process that fetches
+        the same entry. By default, the waiting time covers a request whose
+        retries are all rate-limited, see :meth:`RequestScheduler.retry_budget`,
+        so that waiters do not send the same request while the other process
+        backs off.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, os.PathLike]] = None,
+        ttl: Optional[float] = None,
+        lock_timeout: Optional[float] = None,
+    ):
+        self.path = Path(path) if path is not None else default_cache_dir()
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    def _entry_path(self, base_url: str, record_id: str, kind: str) -> Path:
+        instance = hashlib.sha256(base_url.encode("utf-8")).hexdigest()[:16]
+        return self.path / instance / f"{quote(record_id, safe='')}.{kind}.json"
+
+    def lookup(self, base_url: str, record_id: str, kind: str) -> Optional[CacheEntry]:
+        """
+        Look up a cache entry, including expired entries.
+
+        Expired entries can be revalidated with a conditional request using
+        their validators.
+
+        Returns
+        -------
+        entry : CacheEntry or None
+            The cache entry or ``None`` if there is no entry.
+        """
+        path = self._entry_path(base_url, record_id, kind)
+        try:
+            # The modification time of the entry marks when it was last validated
+            stored = path.stat().st_mtime
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        return CacheEntry(
+            data=entry["data"],
+            validators=entry.get("validators", dict()),
+            fresh=self.ttl is None or time.time() - stored <= self.ttl,
+        )
+
+    def lock(self, base_url: str, record_id: str, kind: str) -> FileLock:
+        """
+        Get the lock of a cache entry.
+
+        The lock is meant to be held while the entry is fetched, so that
+        concurrent processes that need the same entry wait for the result
+        instead of sending the same request.
+        """
+        path = self._entry_path(base_url, record_id, kind)
+        timeout = self.lock_timeout
+        if timeout is None:
+            timeout = get_scheduler().retry_budget() + DEFAULT_LOCK_TIMEOUT
+        return FileLock(path.with_suffix(".lock"), timeout=timeout)
+
+    def get(self, base_url: str, record_id: str, kind: str) -> Optional[Any]:
+        """
+        Look up a cache entry.
+
+        Returns
+        -------
+        data : Any or None
+            The cached data or ``None`` if there is no valid entry.
+        """
+        entry = self.lookup(base_url, record_id, kind)
+        if entry is None or not entry.fresh:
+            return None
+        return entry.data
+
+    def set(
+        self,
+        base_url: str,
+        record_id: str,
+        kind: str,
+        data: Any,
+        validators: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Store a cache entry.
+
+        The entry is written to a temporary file first and then moved into
+        place, so that readers never see a partially written entry.
+
+        Parameters
+        ----------
+        validators : Dict[str, str], optional
+            The ``ETag`` and ``Last-Modified`` headers of the response the
+            data was taken from.
+        """
+        _write_json_atomically(
+            self._entry_path(base_url, record_id, kind),
+            {"data": data, "validators": validators or dict()},
+        )
+
+    def touch(self, base_url: str, record_id: str, kind: str):
+        """
+        Mark an existing entry as fresh after it was successfully revalidated.
+        """
+        try:
+            os.utime(self._entry_path(base_url, record_id, kind))
+        except OSError:
+            pass
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        for entry in self.path.glob("*/*.json"):
+            entry.unlink()
+
+
+class MetadataSnapshot:
+    """
+    A portable snapshot of the metadata of InvenioRDM records.
+
+    Snapshots are single JSON files that are exported on a machine with network
+    access (see :func:`pooch_invenio.snapshot.export_snapshot`) and allow to
+    resolve the contained records without any network access.
+
+    Parameters
+    ----------
+    path : str or PathLike, optional
+        The snapshot file to load. If omitted, an empty snapshot is created.
+    """
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None):
+        self._records: Dict[str, dict] = {}
+        if path is not None:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported metadata snapshot version {snapshot.get('version')!r} in '{path}'."
+                )
+            self._records = snapshot["records"]
+
+    @staticmethod
+    def _key(base_url: str, record_id: str) -> str:
+        return f"{base_url}/records/{record_id}"
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, archive_url: str):
+        return archive_url.strip("/") in self._records
+
+    def get(self, base_url: str, record_id: str, kind: str) -> Optional[Any]:
+        """
+        Look up the metadata of a record.
+
+        Parameters
+        ----------
+        kind : str
+            Either ``"files"``, ``"details"`` or ``"rights"``, which is
+            extracted from the details.
+
+        Returns
+        -------
+        data : Any or None
+            The metadata or ``None`` if it is not part of the snapshot.
+        """
+        record = self._records.get(self._key(base_url, record_id))
+        if kind == "rights":
+            details = self.get(base_url, record_id, "details")
+            return None if details is None else record_rights(details)
+        if record is None or record.get(kind) is None:
+            return None
+        if kind == "files":
+            return index_from_json(record["files"])
+        return record[kind]
+
+    def add(
+        self,
+        doi: str,
+        base_url: str,
+        record_id: str,
+        files: Dict[str, FileEntry],
+        details: Optional[dict] = None,
+    ):
+        """
+        Add the metadata of a record to the snapshot.
+        """
+        self._records[self._key(base_url, record_id)] = {
+            "doi": doi,
+            "files": index_to_json(files),
+            "details": details,
+        }
+
+    def write(self, path: Union[str, os.PathLike]):
+        """
+        Write the snapshot to a file.
+        """
+        _write_json_atomically(
+            Path(path), {"version": SNAPSHOT_FORMAT_VERSION, "records": self._records}
+        )
+
+
+class ProbeCache:
+    """
+    A persistent cache of whether hosts are InvenioRDM instances.
+
+    The generic InvenioRDM repository probes every URL of the form
+    ``<base_url>/records/<record_id>`` with a request. The verdicts of these
+    probes are cached per base URL, so that hosts which are known not to be
+    InvenioRDM instances are not probed again.
+
+    Parameters
+    ----------
+    path : str or PathLike, optional
+        The file to store the verdicts in. Defaults to a file next to the
+        pooch cache directory.
+    ttl : float, optional
+        The time in seconds after which a verdict expires. If ``None``,
+        verdicts never expire.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, os.PathLike]] = None,
+        ttl: Optional[float] = DEFAULT_PROBE_TTL,
+    ):
+        self.path = (
+            Path(path)
+            if path is not None
+            else default_cache_dir().parent / "instances.json"
+        )
+        self.ttl = ttl
+        self._verdicts: Optional[Dict[str, list]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, list]:
+        if self._verdicts is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._verdicts = json.load(f)
+            except (OSError, ValueError):
+                self._verdicts = dict()
+        return self._verdicts
+
+    def get(self, base_url: str) -> Optional[bool]:
+        """
+        Look up the verdict for a base URL.
+
+        Returns
+        -------
+        verdict : bool or None
+            Whether the host is an InvenioRDM instance or ``None`` if there is
+            no valid verdict.
+        """
+        with self._lock:
+            entry = self._load().get(base_url)
+        if entry is None:
+            return None
+        verdict, checked = entry
+        if self.ttl is not None and time.time() - checked > self.ttl:
+            return None
+        return verdict
+
+    def _file_lock(self) -> "FileLock":
+        return FileLock(self.path.with_name(f"{self.path.name}.lock"))
+
+    def set(self, base_url: str, verdict: bool):
+        """
+        Store the verdict for a base URL.
+        """
+        with self._lock, self._file_lock():
+            # Other processes might have stored verdicts in the meantime
+            self._verdicts = None
+            verdicts = self._load()
+            verdicts[base_url] = [verdict, time.time()]
+            _write_json_atomically(self.path, verdicts)
+
+    def clear(self):
+        """
+        Remove all verdicts.
+        """
+        with self._lock, self._file_lock():
+            self._verdicts = dict()
+            _write_json_atomically(self.path, self._verdicts)
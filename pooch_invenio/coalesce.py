@@ -0,0 +1,134 @@
+import collections
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+class RequestCoalescer:
+    """
+    Deduplicates concurrent fetches within a process.
+
+    If several threads fetch the same key at the same time, only the first
+    one performs the fetch while the others wait for its result. Optionally,
+    recently fetched metadata is kept in a bounded least-recently-used cache
+    that is shared by all repository instances, e.g.
+    ``set_coalescer(RequestCoalescer(max_entries=128))``.
+
+    Parameters
+    ----------
+    max_entries : int
+        The maximum number of entries kept in memory. If zero (the default),
+        only concurrent fetches are deduplicated.
+    """
+
+    def __init__(self, max_entries: int = 0):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[Hashable, Any]" = (
+            collections.OrderedDict()
+        )
+        self._in_flight: Dict[Hashable, "Future"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a recently fetched entry.
+
+        Returns
+        -------
+        data : Any or None
+            The entry or ``None`` if it is not in memory.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, data: Any):
+        """
+        Keep an entry in memory, evicting the least recently used entries.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def run(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Run a fetch unless the same key is already being fetched.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key that identifies the fetch, e.g. a URL.
+        fetch : Callable[[], Any]
+            The function that performs the fetch.
+
+        Returns
+        -------
+        result : Any
+            The result of the fetch. If it raised an exception, the exception
+            is raised for all callers waiting for it.
+        """
+        from concurrent.futures import Future  # pylint: disable=C0415
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def clear(self):
+        """
+        Remove all entries from memory.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_coalescer_lock = threading.Lock()
+_coalescer: Optional[RequestCoalescer] = None
+
+
+def get_coalescer() -> RequestCoalescer:
+    """
+    Get the request coalescer shared by all InvenioRDM repositories.
+    """
+    global _coalescer
+
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = RequestCoalescer()
+        return _coalescer
+
+
+def set_coalescer(coalescer: Optional[RequestCoalescer]):
+    """
+    Replace the request coalescer shared by all InvenioRDM repositories.
+
+    Passing ``None`` resets to a default coalescer, which is created on next use.
+    """
+    global _coalescer
+
+    with _coalescer_lock:
+        _coalescer = coalescer
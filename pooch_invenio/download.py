@@ -0,0 +1,630 @@
+import collections
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from pooch_doi.repository import DEFAULT_TIMEOUT
+
+from .cache import _write_json_atomically
+from .files import CHUNK_SIZE, FileEntry
+from .http import get_session
+from .ratelimit import HostConcurrencyLimiter, get_scheduler
+from .store import ContentStore, link_file
+
+# The default maximum number of concurrent downloads across all hosts
+DEFAULT_MAX_WORKERS = 8
+
+# The default maximum number of concurrent downloads per host
+DEFAULT_MAX_PER_HOST = 4
+
+# The cost of a single request expressed in transferred bytes. It accounts for
+# the round-trip and the rate limit budget when deciding whether to download
+# the archive of a record instead of its files one by one.
+REQUEST_COST = 1024 * 1024
+
+# The default size of the byte ranges of segmented downloads
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+def default_download_dir(
+    doi: str, path: Optional[Union[str, os.PathLike]] = None
+) -> Path:
+    """
+    The default directory to download the files of a record to.
+
+    The directory is named after the DOI of the record and located in the
+    given directory or in the pooch cache directory of the operating system.
+    """
+    if path is None:
+        import pooch  # pylint: disable=C0415
+
+        path = pooch.os_cache("pooch")
+    return Path(path) / doi.replace("/", "_")
+
+
+def parse_checksum(checksum: str) -> Tuple[str, str]:
+    """
+    Split a checksum of the form ``<algorithm>:<hash>`` as used by InvenioRDM.
+    """
+    algorithm, _, value = checksum.partition(":")
+    if not value:
+        raise ValueError(f"Invalid checksum '{checksum}'.")
+    return algorithm.lower(), value.lower()
+
+
+def file_hash(path: Union[str, os.PathLike], algorithm: str) -> str:
+    """
+    Compute the hash of a local file.
+    """
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def is_valid(path: Union[str, os.PathLike], entry: FileEntry) -> bool:
+    """
+    Whether a local file exists and matches the checksum of a file entry.
+    """
+    if not os.path.isfile(path):
+        return False
+    if entry.size is not None and os.path.getsize(path) != entry.size:
+        return False
+    if entry.checksum is None:
+        return True
+    algorithm, value = parse_checksum(entry.checksum)
+    return file_hash(path, algorithm) == value
+
+
+def _target(path: Path, key: str) -> Path:
+    target = path / key
+    if not target.resolve().is_relative_to(path.resolve()):
+        raise ValueError(f"Refusing to write '{key}' outside of '{path}'.")
+    return target
+
+
+def _hasher(entry: FileEntry):
+    if entry.checksum is None:
+        return None
+    algorithm, _ = parse_checksum(entry.checksum)
+    return hashlib.new(algorithm)
+
+
+def _part(target: Path) -> Path:
+    return target.with_name(f"{target.name}.part")
+
+
+def _finish(entry: FileEntry, part: Path, target: Path, hasher, source: str) -> Path:
+    # Move a completely downloaded file into place if its checksum matches
+    if hasher is not None:
+        _, expected = parse_checksum(entry.checksum)
+        if hasher.hexdigest() != expected:
+            os.unlink(part)
+            raise ValueError(
+                f"Checksum mismatch for '{entry.key}' downloaded from '{source}': "
+                f"expected {entry.checksum}, got {hasher.name}:{hasher.hexdigest()}."
+            )
+    os.replace(part, target)
+    return target
+
+
+def _write_verified(
+    entry: FileEntry, chunks: Iterator[bytes], target: Path, source: str
+) -> Path:
+    # The chunks are written to a temporary file next to the target while the
+    # checksum is computed and only moved into place if the checksum matches.
+    target.parent.mkdir(parents=True, exist_ok=True)
+    part = _part(target)
+    hasher = _hasher(entry)
+    with open(part, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+    return _finish(entry, part, target, hasher, source)
+
+
+def _get(url: str, headers: Optional[Dict[str, str]] = None):
+    session = get_session()
+    return get_scheduler().request(
+        url,
+        lambda: session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT, stream=True),
+    )
+
+
+def _progress(part: Path) -> Path:
+    return part.with_name(f"{part.name}.json")
+
+
+def _download_resumable(entry: FileEntry, target: Path) -> Path:
+    part = _part(target)
+
+    # A segmented partial download is preallocated, so it cannot be continued
+    # at its end. download_file resumes those if it can, otherwise we restart.
+    if _progress(part).exists():
+        part.unlink(missing_ok=True)
+        _progress(part).unlink()
+
+    resumed = part.exists() and part.stat().st_size > 0
+    try:
+        return _download_from_part(entry, target, part)
+    except ValueError:
+        if not resumed:
+            raise
+    # The partial download might be a leftover of another version of the file.
+    # It was discarded on the checksum mismatch, so we start over once.
+    return _download_from_part(entry, target, part)
+
+
+def _download_from_part(entry: FileEntry, target: Path, part: Path) -> Path:
+    hasher = _hasher(entry)
+
+    # A partial download of an earlier attempt is continued with a range request
+    offset = part.stat().st_size if part.exists() else 0
+    if entry.size is not None and offset > entry.size:
+        offset = 0
+    if offset and hasher is not None:
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+
+    if entry.size is None or offset < entry.size:
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        with _get(entry.content_url, headers) as response:
+            # The server might not support ranges or the partial download might
+            # already be complete if the size of the file is not known.
+            if response.status_code != 416:
+                response.raise_for_status()
+                if response.status_code != 206 and offset:
+                    offset = 0
+                    hasher = _hasher(entry)
+                with open(part, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+
+    return _finish(entry, part, target, hasher, entry.content_url)
+
+
+def _download_segmented(
+    entry: FileEntry, target: Path, segments: int, segment_size: int
+) -> Path:
+    part = _part(target)
+    progress = _progress(part)
+
+    # The finished segments are recorded next to the partial download, so that
+    # an interrupted download only fetches the missing segments again. It is
+    # resumed with the segment size it was started with.
+    done = set()
+    if part.exists() and part.stat().st_size == entry.size:
+        try:
+            with open(progress, encoding="utf-8") as f:
+                recorded = json.load(f)
+            segment_size = recorded["segment_size"]
+            done = set(recorded["done"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    if not done:
+        with open(part, "wb") as f:
+            f.truncate(entry.size)
+    lock = threading.Lock()
+
+    def fetch(start: int):
+        end = min(start + segment_size, entry.size) - 1
+        with _get(entry.content_url, {"Range": f"bytes={start}-{end}"}) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise RuntimeError(
+                    f"The server of '{entry.content_url}' does not support range requests."
+                )
+            with open(part, "r+b") as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+        with lock:
+            done.add(start)
+            _write_json_atomically(
+                progress, {"segment_size": segment_size, "done": sorted(done)}
+            )
+
+    starts = [s for s in range(0, entry.size, segment_size) if s not in done]
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        for future in [executor.submit(fetch, start) for start in starts]:
+            future.result()
+
+    # The segments arrive out of order, so the checksum is computed afterwards
+    hasher = _hasher(entry)
+    if hasher is not None:
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+    progress.unlink()
+    return _finish(entry, part, target, hasher, entry.content_url)
+
+
+def download_file(
+    entry: FileEntry,
+    target: Union[str, os.PathLike],
+    segments: int = 1,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+) -> Path:
+    """
+    Download a single file of a record.
+
+    The file is streamed into a temporary file next to the target, its
+    checksum is computed on the fly and only if it matches, the file is moved
+    into place. Readers therefore never see partial or corrupted files.
+
+    If a download is interrupted, the partial file is kept and the next
+    attempt resumes it with HTTP range requests, segmented downloads included.
+
+    Parameters
+    ----------
+    entry : FileEntry
+        The file to download.
+    target : str or PathLike
+        The path to write the file to.
+    segments : int
+        The number of byte ranges of the file to download concurrently.
+        Only files larger than ``segment_size`` are split into segments.
+    segment_size : int
+        The size of the segments in bytes.
+
+    Returns
+    -------
+    path : Path
+        The path of the downloaded file.
+    """
+    if entry.content_url is None:
+        raise KeyError("content")
+
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if entry.size is not None and (
+        (segments > 1 and entry.size > segment_size)
+        or _progress(_part(target)).exists()
+    ):
+        # An interrupted segmented download is resumed segmented
+        return _download_segmented(entry, target, max(segments, 1), segment_size)
+    return _download_resumable(entry, target)
+
+
+@dataclasses.dataclass
+class DownloadPlan:
+    """
+    What downloading a selection of files of a record involves.
+
+    Files of unknown size are counted with a size of zero.
+
+    Attributes
+    ----------
+    path : Path
+        The directory the files are downloaded to.
+    entries : List[FileEntry]
+        The selected files.
+    cached : Set[str]
+        The names of the files that were already downloaded and are valid.
+    archive_size : int, optional
+        The size of the archive of the record in bytes, if the missing files
+        are extracted from it. The archive is stored next to the extracted
+        files until all of them are extracted.
+    """
+
+    path: Path
+    entries: List[FileEntry]
+    cached: Set[str]
+    archive_size: Optional[int] = None
+
+    @property
+    def sizes(self) -> Dict[str, Optional[int]]:
+        """
+        The sizes of the selected files in bytes, keyed by file name.
+        """
+        return {entry.key: entry.size for entry in self.entries}
+
+    @property
+    def missing(self) -> List[FileEntry]:
+        """
+        The files that need to be downloaded.
+        """
+        return [entry for entry in self.entries if entry.key not in self.cached]
+
+    @property
+    def total_size(self) -> int:
+        """
+        The total size of the selected files in bytes.
+        """
+        return sum(entry.size or 0 for entry in self.entries)
+
+    @property
+    def download_size(self) -> int:
+        """
+        The number of bytes that need to be downloaded.
+        """
+        return sum(entry.size or 0 for entry in self.missing)
+
+    @property
+    def required_space(self) -> int:
+        """
+        The number of bytes of disk space that the download needs at its peak.
+        """
+        return self.download_size + (self.archive_size or 0)
+
+    def check_free_space(self):
+        """
+        Check that the files that need to be downloaded fit on the disk.
+
+        Raises
+        ------
+        RuntimeError
+            If there is not enough free space.
+        """
+        check_free_space([self])
+
+
+def plan_download(
+    entries: Iterable[FileEntry],
+    path: Union[str, os.PathLike],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> DownloadPlan:
+    """
+    Plan the download of files into a directory.
+
+    Files that already exist in the directory are verified against their
+    checksums concurrently.
+
+    Parameters
+    ----------
+    entries : Iterable[FileEntry]
+        The files to download.
+    path : str or PathLike
+        The directory to download the files to.
+    max_workers : int
+        The maximum number of files verified concurrently.
+
+    Returns
+    -------
+    plan : DownloadPlan
+        The download plan.
+    """
+    path = Path(path)
+    entries = list(entries)
+    targets = [_target(path, entry.key) for entry in entries]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        valid = executor.map(is_valid, targets, entries)
+        cached = {entry.key for entry, v in zip(entries, valid) if v}
+    return DownloadPlan(path, entries, cached)
+
+
+def _existing_parent(path: Path) -> Path:
+    path = path.resolve()
+    while not path.exists():
+        path = path.parent
+    return path
+
+
+def check_free_space(plans: Iterable[DownloadPlan]):
+    """
+    Check that the downloads of several plans fit on the disks.
+
+    The sizes of all plans that download to the same file system are added up.
+
+    Raises
+    ------
+    RuntimeError
+        If there is not enough free space on one of the file systems.
+    """
+    needed = collections.defaultdict(int)
+    locations = dict()
+    for plan in plans:
+        location = _existing_parent(plan.path)
+        device = location.stat().st_dev
+        needed[device] += plan.required_space
+        locations.setdefault(device, location)
+
+    for device, size in needed.items():
+        free = shutil.disk_usage(locations[device]).free
+        if size > free:
+            raise RuntimeError(
+                f"Not enough free space in '{locations[device]}': "
+                f"{size} bytes are needed for the download, but only {free} bytes are free."
+            )
+
+
+def use_archive(missing: List[FileEntry], archive_size: Optional[int] = None) -> bool:
+    """
+    Whether downloading the archive of a record is cheaper than downloading
+    the missing files one by one.
+
+    Every request is weighed with :data:`REQUEST_COST` bytes, so the archive
+    pays off for many small files even if some of its content is already
+    available locally.
+
+    Parameters
+    ----------
+    missing : List[FileEntry]
+        The files that need to be downloaded.
+    archive_size : int, optional
+        The total size of all files of the record. Defaults to the size of
+        the missing files.
+    """
+    if len(missing) < 2 or any(entry.size is None for entry in missing):
+        return False
+    missing_size = sum(entry.size for entry in missing)
+    if archive_size is None:
+        archive_size = missing_size
+    return archive_size + REQUEST_COST < missing_size + len(missing) * REQUEST_COST
+
+
+def download_archive(
+    archive_url: str, entries: Iterable[FileEntry], path: Union[str, os.PathLike]
+) -> Dict[str, Path]:
+    """
+    Download the archive of a record and extract the given files from it.
+
+    InvenioRDM serves all files of a record as a single zip archive. The
+    archive is streamed to a temporary file, because the index of a zip
+    archive is located at its end, and every extracted file is verified
+    against its checksum before it is moved into place.
+
+    Parameters
+    ----------
+    archive_url : str
+        The URL of the archive, i.e. ``<base_url>/api/records/<id>/files-archive``.
+    entries : Iterable[FileEntry]
+        The files to extract.
+    path : str or PathLike
+        The directory to extract the files to.
+
+    Returns
+    -------
+    paths : Dict[str, Path]
+        The local paths of the extracted files, keyed by file name. Files
+        that are missing from the archive are not included.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    wanted = {entry.key: entry for entry in entries}
+
+    fd, tmp = tempfile.mkstemp(dir=path, suffix=".zip.part")
+    try:
+        with os.fdopen(fd, "wb") as f, _get(archive_url) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+
+        paths = dict()
+        with zipfile.ZipFile(tmp) as archive:
+            for info in archive.infolist():
+                entry = wanted.get(info.filename)
+                if entry is None:
+                    continue
+                with archive.open(info) as member:
+                    paths[entry.key] = _write_verified(
+                        entry,
+                        iter(lambda: member.read(CHUNK_SIZE), b""),
+                        _target(path, entry.key),
+                        archive_url,
+                    )
+        return paths
+    finally:
+        os.unlink(tmp)
+
+
+def download_files(
+    entries: Iterable[FileEntry],
+    path: Union[str, os.PathLike],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+    archive_url: Optional[str] = None,
+    archive_size: Optional[int] = None,
+    bulk: Optional[bool] = None,
+    segments: int = 1,
+    sources: Optional[Mapping[str, Union[str, os.PathLike]]] = None,
+    store: Optional[ContentStore] = None,
+) -> Dict[str, Path]:
+    """
+    Download many files concurrently.
+
+    Files that already exist in ``path`` with a matching checksum are not
+    downloaded again. If the missing files do not fit on the disk, nothing is
+    downloaded at all. If the archive of the record is given and downloading
+    it is cheaper (see :func:`use_archive`), the missing files are extracted
+    from the archive instead.
+
+    Parameters
+    ----------
+    entries : Iterable[FileEntry]
+        The files to download.
+    path : str or PathLike
+        The directory to download the files to.
+    max_workers : int
+        The maximum number of concurrent downloads.
+    max_per_host : int
+        The maximum number of concurrent downloads per host.
+    archive_url : str, optional
+        The URL of the archive of all files of the record.
+    archive_size : int, optional
+        The total size of all files of the record.
+    bulk : bool, optional
+        Whether to download the archive. If ``None`` (the default), the
+        archive is used if it is cheaper.
+    segments : int
+        The number of byte ranges to download concurrently for large files,
+        see :func:`download_file`.
+    sources : Mapping[str, str or PathLike], optional
+        Local files keyed by their checksum. Missing files with one of these
+        checksums are linked into place instead of being downloaded.
+    store : ContentStore, optional
+        A content-addressed store to link files from instead of downloading
+        them. All files are added to the store.
+
+    Returns
+    -------
+    paths : Dict[str, Path]
+        The local paths of the files, keyed by file name.
+
+    Raises
+    ------
+    RuntimeError
+        If there is not enough free space.
+    """
+    path = Path(path)
+    plan = plan_download(entries, path, max_workers=max_workers)
+    for entry in plan.missing:
+        source = None
+        if sources is not None and entry.checksum in sources:
+            source = sources[entry.checksum]
+        elif store is not None and entry.checksum is not None:
+            source = store.get(entry.checksum)
+        if source is not None:
+            link_file(source, path / entry.key)
+            plan.cached.add(entry.key)
+
+    missing = plan.missing
+    if archive_url is not None and (
+        bulk or (bulk is None and use_archive(missing, archive_size))
+    ):
+        plan.archive_size = plan.download_size if archive_size is None else archive_size
+    plan.check_free_space()
+
+    targets = {entry.key: path / entry.key for entry in plan.entries}
+    limiter = HostConcurrencyLimiter(max_per_host)
+
+    def fetch(entry: FileEntry) -> Path:
+        with limiter(entry.content_url or ""):
+            return download_file(entry, targets[entry.key], segments=segments)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if plan.archive_size is not None:
+            extracted = download_archive(archive_url, missing, path)
+            missing = [entry for entry in missing if entry.key not in extracted]
+
+        for future in [executor.submit(fetch, entry) for entry in missing]:
+            future.result()
+
+    if store is not None:
+        for entry in plan.entries:
+            if entry.checksum is not None:
+                store.add(entry.checksum, targets[entry.key])
+    return targets
@@ -0,0 +1,273 @@
+import codecs
+import json
+from typing import Any, Dict, Optional
+
+# The size of the chunks in which files listings are read from the network
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+# The characters that may follow a JSON value inside an object or an array
+_DELIMITERS = ",}]" + _WHITESPACE
+
+
+class IncrementalObjectParser:
+    """
+    The base class of incremental parsers of a JSON object.
+
+    The object is fed to the parser in chunks of bytes. The parser walks
+    through the members of the object and decodes each member value as soon
+    as it is complete. Subclasses decide how the value of a member is parsed
+    in :meth:`_member_state` and handle the states they introduce in
+    :meth:`_parse_member`.
+    """
+
+    # The name of the parsed document in error messages
+    _document = "JSON object"
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self._closed = False
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the parser does not need any more data.
+        """
+        return False
+
+    def feed(self, chunk: bytes):
+        """
+        Parse the next chunk of the response.
+        """
+        self._buffer += self._decoder.decode(chunk)
+        self._parse()
+
+    def close(self):
+        """
+        Finish parsing.
+
+        Raises
+        ------
+        ValueError
+            If the response was not a complete JSON object.
+        """
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._closed = True
+        self._parse()
+        if not self.done and self._state != "end":
+            raise ValueError(f"The {self._document} ended unexpectedly.")
+
+    def _skip_whitespace(self) -> bool:
+        # Returns whether there is any non-whitespace left in the buffer
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buffer)
+
+    def _expect(self, characters: str) -> str:
+        char = self._buffer[self._pos]
+        if char not in characters:
+            raise ValueError(
+                f"Unexpected character {char!r} in {self._document}, expected one of {characters!r}."
+            )
+        self._pos += 1
+        return char
+
+    def _decode_value(self):
+        # Returns whether a complete value was decoded
+        try:
+            value, end = self._json.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._closed:
+                raise
+            return False, None
+
+        # A number or literal is only complete once the character after it was
+        # received, e.g. "1000." might continue with a fraction or an exponent
+        if not self._closed and self._buffer[self._pos] not in '"{[':
+            if end == len(self._buffer) or self._buffer[end] not in _DELIMITERS:
+                return False, None
+
+        self._pos = end
+        return True, value
+
+    def _member_state(self, key: str) -> str:
+        # Returns the state in which the value of the member is parsed
+        raise NotImplementedError
+
+    def _parse_member(self) -> bool:
+        # Handles the states of the subclass, returns whether it made progress
+        raise NotImplementedError
+
+    def _parse(self):
+        while not self.done and self._skip_whitespace():
+            if self._state == "start":
+                self._expect("{")
+                self._state = "first_key"
+            elif self._state in ("first_key", "key"):
+                if self._state == "first_key" and self._buffer[self._pos] == "}":
+                    self._pos += 1
+                    self._state = "end"
+                    continue
+                complete, self._key = self._decode_value()
+                if not complete:
+                    break
+                self._state = "colon"
+            elif self._state == "colon":
+                self._expect(":")
+                self._state = self._member_state(self._key)
+            elif self._state == "member_end":
+                self._state = "key" if self._expect(",}") == "," else "end"
+            elif self._state == "end":
+                raise ValueError(
+                    f"Unexpected data after the end of the {self._document}."
+                )
+            elif not self._parse_member():
+                break
+
+        # Drop everything that was already consumed
+        self._buffer = self._buffer[self._pos :]
+        self._pos = 0
+
+
+class FilesListingParser(IncrementalObjectParser):
+    """
+    An incremental parser for the files listing of an InvenioRDM record.
+
+    The response of the ``/api/records/<id>/files`` endpoint is fed to the
+    parser in chunks of bytes. File entries are parsed one by one as soon as
+    they are complete and collected into an index of compact :class:`FileEntry`
+    objects keyed by file name. Neither the raw response nor the list of entries
+    is ever held in memory as a whole.
+
+    Attributes
+    ----------
+    entries : Dict[str, FileEntry]
+        The file entries parsed so far, keyed by file name.
+    fields : Dict[str, Any]
+        All other top-level fields of the listing, e.g. ``links``.
+
+    Parameters
+    ----------
+    entries : Dict[str, FileEntry], optional
+        An existing index to add the entries to, e.g. when parsing several
+        pages of a paginated listing.
+    """
+
+    _document = "files listing"
+
+    def __init__(self, entries: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.entries: Dict[str, Any] = entries if entries is not None else {}
+        self.fields: Dict[str, Any] = {}
+
+    def add_entry(self, entry: dict):
+        """
+        Add a parsed file entry to the index.
+
+        Override this to customize how entries are stored.
+        """
+        self.entries[entry["key"]] = FileEntry.from_api(entry)
+
+    def _member_state(self, key: str) -> str:
+        return "entries" if key == "entries" else "value"
+
+    def _parse_member(self) -> bool:
+        if self._state == "value":
+            complete, value = self._decode_value()
+            if not complete:
+                return False
+            self.fields[self._key] = value
+            self._state = "member_end"
+        elif self._state == "entries":
+            self._expect("[")
+            self._state = "first_entry"
+        elif self._state in ("first_entry", "entry"):
+            if self._state == "first_entry" and self._buffer[self._pos] == "]":
+                self._pos += 1
+                self._state = "member_end"
+                return True
+            complete, entry = self._decode_value()
+            if not complete:
+                return False
+            self.add_entry(entry)
+            self._state = "entry_end"
+        else:
+            self._state = "entry" if self._expect(",]") == "," else "member_end"
+        return True
+
+
+class FileEntry:
+    """
+    A compact representation of a file in an InvenioRDM record.
+
+    Only the fields needed by the repository are kept from the file entries
+    returned by the API.
+
+    Attributes
+    ----------
+    key : str
+        The file name.
+    checksum : str or None
+        The checksum of the file, e.g. ``"md5:<hash>"``.
+    size : int or None
+        The size of the file in bytes.
+    content_url : str or None
+        The URL to download the file content from.
+    """
+
+    __slots__ = ("key", "checksum", "size", "content_url")
+
+    def __init__(
+        self,
+        key: str,
+        checksum: Optional[str] = None,
+        size: Optional[int] = None,
+        content_url: Optional[str] = None,
+    ):
+        self.key = key
+        self.checksum = checksum
+        self.size = size
+        self.content_url = content_url
+
+    @classmethod
+    def from_api(cls, entry: dict) -> "FileEntry":
+        """
+        Create a file entry from an entry of the API response.
+        """
+        return cls(
+            entry["key"],
+            entry.get("checksum"),
+            entry.get("size"),
+            (entry.get("links") or dict()).get("content"),
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, FileEntry):
+            return NotImplemented
+        return all(getattr(self, a) == getattr(other, a) for a in self.__slots__)
+
+    def __repr__(self):
+        return (
+            f"FileEntry(key={self.key!r}, checksum={self.checksum!r}, "
+            f"size={self.size!r}, content_url={self.content_url!r})"
+        )
+
+
+def index_to_json(index: Dict[str, FileEntry]) -> Dict[str, list]:
+    """
+    Serialize an index of file entries into a compact JSON-compatible form.
+    """
+    return {k: [e.checksum, e.size, e.content_url] for k, e in index.items()}
+
+
+def index_from_json(data: Dict[str, list]) -> Dict[str, FileEntry]:
+    """
+    Deserialize an index of file entries created with :func:`index_to_json`.
+    """
+    return {k: FileEntry(k, *values) for k, values in data.items()}
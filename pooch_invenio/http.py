@@ -0,0 +1,106 @@
+import threading
+from typing import Dict, Optional
+
+# The number of per-host connection pools that are kept alive
+DEFAULT_POOL_CONNECTIONS = 10
+
+# The maximum number of connections that are kept alive per host
+DEFAULT_POOL_MAXSIZE = 10
+
+_session_lock = threading.Lock()
+_session = None
+_session_config = {
+    "pool_connections": DEFAULT_POOL_CONNECTIONS,
+    "pool_maxsize": DEFAULT_POOL_MAXSIZE,
+    "host_pool_maxsize": {},
+}
+
+
+def _create_session():
+    import requests  # pylint: disable=C0415
+    from requests.adapters import HTTPAdapter  # pylint: disable=C0415
+
+    session = requests.Session()
+
+    def adapter(pool_maxsize):
+        return HTTPAdapter(
+            pool_connections=_session_config["pool_connections"],
+            pool_maxsize=pool_maxsize,
+        )
+
+    session.mount("https://", adapter(_session_config["pool_maxsize"]))
+    session.mount("http://", adapter(_session_config["pool_maxsize"]))
+    for prefix, pool_maxsize in _session_config["host_pool_maxsize"].items():
+        session.mount(prefix, adapter(pool_maxsize))
+
+    return session
+
+
+def get_session():
+    """
+    Get the shared HTTP session used for all requests to InvenioRDM instances.
+
+    The session is created on first use and reuses connections (keep-alive)
+    across requests to the same host. It is safe to call this function from
+    multiple threads.
+
+    Returns
+    -------
+    session : requests.Session
+        The shared session.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+
+def set_session(session):
+    """
+    Inject a custom HTTP session to be used for all requests.
+
+    Parameters
+    ----------
+    session : requests.Session or None
+        The session to use. Passing ``None`` resets to the default session,
+        which is created on next use.
+    """
+    global _session
+
+    with _session_lock:
+        _session = session
+
+
+def configure_session(
+    pool_connections: Optional[int] = None,
+    pool_maxsize: Optional[int] = None,
+    host_pool_maxsize: Optional[Dict[str, int]] = None,
+):
+    """
+    Configure the connection pooling of the default HTTP session.
+
+    The current session is discarded and a new one with the given configuration
+    is created on next use.
+
+    Parameters
+    ----------
+    pool_connections : int, optional
+        The number of per-host connection pools to keep alive.
+    pool_maxsize : int, optional
+        The maximum number of connections kept alive per host.
+    host_pool_maxsize : Dict[str, int], optional
+        Overrides of ``pool_maxsize`` for specific URL prefixes, e.g.
+        ``{"https://zenodo.org": 20}``.
+    """
+    global _session
+
+    with _session_lock:
+        if pool_connections is not None:
+            _session_config["pool_connections"] = pool_connections
+        if pool_maxsize is not None:
+            _session_config["pool_maxsize"] = pool_maxsize
+        if host_pool_maxsize is not None:
+            _session_config["host_pool_maxsize"] = dict(host_pool_maxsize)
+        _session = None
@@ -0,0 +1,99 @@
+import threading
+from functools import lru_cache
+from importlib.resources import files
+from typing import Dict, Iterable, Set, Tuple
+from urllib.parse import urlsplit
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _normalize(url: str) -> Tuple[str, Tuple[str, ...]]:
+    # Split a URL into a normalized host and its path segments. The scheme, query
+    # string and fragment are ignored, as are a leading "www." and default ports.
+    if "://" not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url.strip())
+
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port is not None and parts.port != _DEFAULT_PORTS.get(parts.scheme):
+        host = f"{host}:{parts.port}"
+
+    return host, tuple(segment for segment in parts.path.split("/") if segment)
+
+
+class InstanceIndex:
+    """
+    An index of InvenioRDM instances for fast matching of URLs.
+
+    Instances are stored by their normalized host name together with the set
+    of path prefixes under which they are hosted. Matching a URL is a single
+    dictionary lookup plus one set lookup per path segment, independent of the
+    number of instances.
+
+    Parameters
+    ----------
+    urls : Iterable[str]
+        The URLs of the instances to add to the index.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._hosts: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url: str):
+        """
+        Add an instance to the index.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the instance, e.g. ``"https://zenodo.org"``.
+        """
+        host, prefix = _normalize(url)
+        if not host:
+            return
+        with self._lock:
+            self._hosts.setdefault(host, set()).add(prefix)
+
+    def __len__(self):
+        return sum(len(prefixes) for prefixes in self._hosts.values())
+
+    def __contains__(self, url: str) -> bool:
+        """
+        Whether the given URL belongs to any of the indexed instances.
+        """
+        host, segments = _normalize(url)
+        prefixes = self._hosts.get(host)
+        if not prefixes:
+            return False
+        return any(segments[:i] in prefixes for i in range(len(segments) + 1))
+
+
+@lru_cache(maxsize=1)
+def known_instances() -> InstanceIndex:
+    """
+    The index of known InvenioRDM instances.
+
+    The index is loaded once from the list of instances shipped with this
+    package and can be extended with :func:`register_instance`.
+    """
+    instances_file = files("pooch_invenio").joinpath("instances.txt")
+    return InstanceIndex(instances_file.read_text(encoding="utf-8").splitlines())
+
+
+def register_instance(url: str):
+    """
+    Register an additional InvenioRDM instance.
+
+    Records on registered instances are handled without probing the instance.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the instance, e.g. ``"https://data.example.org"``.
+    """
+    known_instances().add(url)
@@ -0,0 +1,253 @@
+"""
+Instrumentation of the requests to InvenioRDM instances.
+
+Instrumentation events are passed to hooks registered with :func:`add_hook`.
+A hook is called with the name of the event and a dictionary of its fields:
+
+``"request"``
+    An HTTP request was answered. Fields: ``endpoint`` (one of ``"probe"``,
+    ``"files"``, ``"details"``, ``"content"``, ``"archive"`` or ``"other"``),
+    ``url``, ``host``, ``status`` and ``seconds``, the time until the
+    response headers arrived. Retried requests emit one event per attempt.
+``"rate_limited"``
+    A request was rate-limited. Fields: ``url``, ``host`` and ``delay``, the
+    number of seconds before the next attempt or ``None`` if the request is
+    not retried.
+``"cache"``
+    Metadata was looked up in a cache. Fields: ``layer`` (one of
+    ``"memory"``, ``"disk"``, ``"snapshot"`` or ``"probe"``), ``kind`` and
+    ``hit``.
+
+Hooks are called synchronously from the thread that issued the request, so
+they should be cheap. :class:`Metrics` is a hook that aggregates the events
+into counters and latency histograms.
+"""
+
+import bisect
+import collections
+import threading
+from typing import Any, Callable, Dict, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# The upper bounds in seconds of the buckets of the latency histograms
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Hook = Callable[[str, Dict[str, Any]], None]
+
+_hooks_lock = threading.Lock()
+_hooks: Tuple[Hook, ...] = ()
+
+
+def add_hook(hook: Hook):
+    """
+    Register a hook that is called for every instrumentation event.
+    """
+    global _hooks
+
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook: Hook):
+    """
+    Unregister a hook registered with :func:`add_hook`.
+    """
+    global _hooks
+
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def instrumented() -> bool:
+    """
+    Whether any hooks are registered.
+    """
+    return bool(_hooks)
+
+
+def emit(event: str, **fields):
+    """
+    Pass an instrumentation event to all registered hooks.
+    """
+    for hook in _hooks:
+        hook(event, fields)
+
+
+def endpoint_type(url: str) -> str:
+    """
+    Classify the URL of a request to an InvenioRDM instance by endpoint.
+    """
+    parts = urlsplit(url).path.strip("/").split("/")
+    try:
+        index = parts.index("records")
+    except ValueError:
+        return "other"
+    rest = parts[index + 2 :]
+    if parts[index - 1 : index] != ["api"] or len(parts) < index + 2:
+        return "other"
+    if not rest:
+        return "details"
+    if rest == ["files"]:
+        return "files"
+    if rest == ["files-archive"]:
+        return "archive"
+    if rest[0] == "files" and rest[-1] == "content":
+        return "content"
+    if rest == ["versions", "latest"]:
+        return "details"
+    return "other"
+
+
+class Histogram:
+    """
+    A histogram of observed values with fixed bucket boundaries.
+
+    Attributes
+    ----------
+    buckets : Sequence[float]
+        The upper bounds of the buckets.
+    counts : List[int]
+        The number of observations per bucket, with an additional last bucket
+        for values above all bounds.
+    count : int
+        The total number of observations.
+    sum : float
+        The sum of all observations.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Add an observation.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Aggregates instrumentation events into counters and latency histograms.
+
+    Register an instance with :func:`add_hook` to start collecting, e.g.::
+
+        metrics = Metrics()
+        add_hook(metrics)
+
+    Attributes
+    ----------
+    requests : Counter
+        The number of requests keyed by endpoint, host and status code.
+    latency : Dict[Tuple[str, str], Histogram]
+        The latency of requests keyed by endpoint and host.
+    rate_limits : Counter
+        The number of rate-limited requests keyed by host.
+    cache : Counter
+        The number of cache lookups keyed by layer, kind and whether they hit.
+
+    Parameters
+    ----------
+    buckets : Sequence[float]
+        The upper bounds in seconds of the buckets of the latency histograms.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard everything collected so far.
+        """
+        with self._lock:
+            self.requests: "collections.Counter[Tuple[str, str, int]]" = (
+                collections.Counter()
+            )
+            self.latency: Dict[Tuple[str, str], Histogram] = {}
+            self.rate_limits: "collections.Counter[str]" = collections.Counter()
+            self.cache: "collections.Counter[Tuple[str, str, bool]]" = (
+                collections.Counter()
+            )
+
+    def __call__(self, event: str, fields: Dict[str, Any]):
+        with self._lock:
+            if event == "request":
+                key = (fields["endpoint"], fields["host"])
+                self.requests[(*key, fields["status"])] += 1
+                if key not in self.latency:
+                    self.latency[key] = Histogram(self.buckets)
+                self.latency[key].observe(fields["seconds"])
+            elif event == "rate_limited":
+                self.rate_limits[fields["host"]] += 1
+            elif event == "cache":
+                self.cache[(fields["layer"], fields["kind"], fields["hit"])] += 1
+
+    def to_prometheus(self, prefix: str = "pooch_invenio") -> str:
+        """
+        Export the metrics in the Prometheus text exposition format.
+
+        Parameters
+        ----------
+        prefix : str
+            The prefix of all metric names.
+
+        Returns
+        -------
+        text : str
+            The metrics, ready to be served to a Prometheus scraper or to be
+            written to a file for the node exporter's textfile collector.
+        """
+
+        def labels(**values) -> str:
+            return ",".join(f'{k}="{v}"' for k, v in values.items())
+
+        lines = [
+            f"# HELP {prefix}_requests_total HTTP requests to InvenioRDM instances.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        with self._lock:
+            for (endpoint, host, status), n in sorted(self.requests.items()):
+                lines.append(
+                    f"{prefix}_requests_total{{{labels(endpoint=endpoint, host=host, status=status)}}} {n}"
+                )
+
+            lines.append(
+                f"# HELP {prefix}_request_seconds Latency of HTTP requests to InvenioRDM instances."
+            )
+            lines.append(f"# TYPE {prefix}_request_seconds histogram")
+            for (endpoint, host), histogram in sorted(self.latency.items()):
+                common = labels(endpoint=endpoint, host=host)
+                cumulative = 0
+                for bound, n in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += n
+                    lines.append(
+                        f'{prefix}_request_seconds_bucket{{{common},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f"{prefix}_request_seconds_sum{{{common}}} {histogram.sum}"
+                )
+                lines.append(
+                    f"{prefix}_request_seconds_count{{{common}}} {histogram.count}"
+                )
+
+            lines.append(
+                f"# HELP {prefix}_rate_limited_total Rate-limited HTTP requests."
+            )
+            lines.append(f"# TYPE {prefix}_rate_limited_total counter")
+            for host, n in sorted(self.rate_limits.items()):
+                lines.append(f"{prefix}_rate_limited_total{{{labels(host=host)}}} {n}")
+
+            lines.append(f"# HELP {prefix}_cache_lookups_total Metadata cache lookups.")
+            lines.append(f"# TYPE {prefix}_cache_lookups_total counter")
+            for (layer, kind, hit), n in sorted(self.cache.items()):
+                result = "hit" if hit else "miss"
+                lines.append(
+                    f"{prefix}_cache_lookups_total{{{labels(layer=layer, kind=kind, result=result)}}} {n}"
+                )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,415 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .metrics import emit, endpoint_type, instrumented
+
+# The default number of retries for rate-limited requests
+DEFAULT_MAX_RETRIES = 5
+
+# The default base delay in seconds for the exponential backoff
+DEFAULT_BACKOFF_FACTOR = 1.0
+
+# The maximum delay in seconds between two attempts
+DEFAULT_MAX_BACKOFF = 120.0
+
+
+class TokenBucket:
+    """
+    A thread-safe client-side token bucket.
+
+    Parameters
+    ----------
+    rate : float, optional
+        The number of tokens added per second. If ``None``, the bucket never
+        runs empty unless it was explicitly paused or drained.
+    capacity : float
+        The maximum number of tokens, i.e. the allowed burst size.
+    clock : Callable[[], float]
+        A monotonic clock.
+    sleep : Callable[[float], None]
+        The function used to wait.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        capacity: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.rate is None:
+            self._tokens = self.capacity
+        else:
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def _take(self) -> float:
+        # Takes a token and returns 0, or returns how long to wait for one
+        now = self._clock()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Take a token from the bucket, waiting until one is available.
+        """
+        # The lock is not held while waiting, so that try_acquire never blocks
+        while True:
+            with self._lock:
+                wait = self._take()
+            if wait == 0.0:
+                return
+            self._sleep(wait)
+
+    def try_acquire(self) -> float:
+        """
+        Take a token from the bucket if one is available, without waiting.
+
+        Returns
+        -------
+        wait : float
+            Zero if a token was taken, otherwise the number of seconds until
+            the next token becomes available.
+        """
+        with self._lock:
+            return self._take()
+
+    def pause(self, seconds: float):
+        """
+        Do not hand out tokens for the given amount of seconds.
+        """
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def update(self, remaining: int, reset: Optional[float] = None):
+        """
+        Synchronize the bucket with the budget reported by the server.
+
+        Parameters
+        ----------
+        remaining : int
+            The number of requests the server still allows in the current window.
+        reset : float, optional
+            The number of seconds until the server resets the window.
+        """
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, remaining)
+            if reset is not None and reset > 0:
+                if remaining <= 0:
+                    self.pause(reset)
+                else:
+                    # Spread the remaining budget evenly across the window,
+                    # but never exceed the configured rate.
+                    self.rate = remaining / reset
+                    if self.max_rate is not None:
+                        self.rate = min(self.rate, self.max_rate)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the value of a ``Retry-After`` header into a number of seconds.
+
+    The header may either contain a number of seconds or an HTTP date.
+    Returns ``None`` if the value cannot be parsed.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    from email.utils import parsedate_to_datetime  # pylint: disable=C0415
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_headers(
+    headers: Mapping[str, str]
+) -> Tuple[Optional[int], Optional[float]]:
+    """
+    Parse the ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset`` headers.
+
+    InvenioRDM sends the reset time as a UNIX timestamp. It is converted into
+    a number of seconds from now.
+
+    Returns
+    -------
+    remaining, reset : Tuple[Optional[int], Optional[float]]
+        The remaining number of requests and the seconds until the reset.
+    """
+    try:
+        remaining = int(headers["X-RateLimit-Remaining"])
+    except (KeyError, ValueError):
+        return None, None
+    try:
+        reset = float(headers["X-RateLimit-Reset"]) - time.time()
+    except (KeyError, ValueError):
+        reset = None
+    return remaining, reset
+
+
+class RequestScheduler:
+    """
+    Schedules requests to InvenioRDM instances under their rate limits.
+
+    The scheduler keeps a client-side token bucket per host that is kept in
+    sync with the ``X-RateLimit-*`` headers sent by the server. Requests that
+    are rate-limited nevertheless (status code 429) are retried after the time
+    given in the ``Retry-After`` header or after an exponential backoff with
+    jitter.
+
+    Parameters
+    ----------
+    max_retries : int
+        The maximum number of retries for a rate-limited request.
+    backoff_factor : float
+        The base delay in seconds of the exponential backoff.
+    max_backoff : float
+        The maximum delay in seconds between two attempts.
+    rate : float, optional
+        The default number of requests per second per host. If ``None``, the
+        rate is only limited by the information the server sends.
+    capacity : float
+        The default burst size per host.
+    clock : Callable[[], float]
+        A monotonic clock.
+    sleep : Callable[[float], None]
+        The function used to wait.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        rate: Optional[float] = None,
+        capacity: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def retry_budget(self) -> float:
+        """
+        The longest time in seconds a request can wait between its retries.
+        """
+        return self.max_retries * self.max_backoff
+
+    def bucket(self, host: str) -> TokenBucket:
+        """
+        Get the token bucket for the given host.
+        """
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(
+                    self.rate, self.capacity, clock=self._clock, sleep=self._sleep
+                )
+            return self._buckets[host]
+
+    def configure_host(self, host: str, rate: Optional[float], capacity: float = 10.0):
+        """
+        Set the client-side rate limit for a given host.
+
+        Parameters
+        ----------
+        host : str
+            The host name, e.g. ``"zenodo.org"``.
+        rate : float, optional
+            The number of requests per second.
+        capacity : float
+            The burst size.
+        """
+        with self._lock:
+            self._buckets[host] = TokenBucket(
+                rate, capacity, clock=self._clock, sleep=self._sleep
+            )
+
+    def backoff(self, attempt: int) -> float:
+        """
+        The delay before the given retry attempt if the server did not tell us.
+        """
+        delay = min(self.max_backoff, self.backoff_factor * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    def retry_delay(self, url: str, response, attempt: int) -> float:
+        """
+        Pause the host of a rate-limited request until it may be retried.
+
+        The delay is taken from the ``Retry-After`` header plus some jitter, or
+        from the exponential backoff if the server did not send one.
+
+        Parameters
+        ----------
+        url : str
+            The URL that the request was sent to.
+        response : requests.Response or httpx.Response
+            The rate-limited response.
+        attempt : int
+            The number of retries so far.
+
+        Returns
+        -------
+        delay : float
+            The delay in seconds before the retry.
+        """
+        host = urlsplit(url).netloc
+        delay = parse_retry_after(response.headers.get("Retry-After"))
+        if delay is None:
+            delay = self.backoff(attempt)
+        else:
+            # Add some jitter to avoid that all clients retry at once
+            delay = delay + random.uniform(0, self.backoff_factor)
+        delay = min(delay, self.max_backoff)
+        emit("rate_limited", url=url, host=host, delay=delay)
+        self.bucket(host).pause(delay)
+        return delay
+
+    def request(
+        self,
+        url: str,
+        send: Callable[[], "requests.Response"],
+        retry=True,
+        endpoint: Optional[str] = None,
+    ):
+        """
+        Send a request under the rate limit of its host.
+
+        Parameters
+        ----------
+        url : str
+            The URL that the request is sent to.
+        send : Callable[[], requests.Response]
+            A function that sends the request.
+        retry : bool
+            Whether rate-limited requests should be retried.
+        endpoint : str, optional
+            The endpoint type reported to instrumentation hooks. Defaults to
+            the type derived from the URL.
+
+        Returns
+        -------
+        response : requests.Response
+            The final response. If all retries were exhausted, this is the
+            last rate-limited response.
+        """
+        host = urlsplit(url).netloc
+        bucket = self.bucket(host)
+
+        attempt = 0
+        while True:
+            bucket.acquire()
+            start = time.perf_counter()
+            response = send()
+            if instrumented():
+                emit(
+                    "request",
+                    endpoint=endpoint or endpoint_type(url),
+                    url=url,
+                    host=host,
+                    status=response.status_code,
+                    seconds=time.perf_counter() - start,
+                )
+
+            remaining, reset = parse_rate_limit_headers(response.headers)
+            if remaining is not None:
+                bucket.update(remaining, reset)
+
+            if response.status_code != 429:
+                return response
+            if not retry or attempt >= self.max_retries:
+                emit("rate_limited", url=url, host=host, delay=None)
+                return response
+
+            # Streamed responses only return their connection to the pool once closed
+            response.close()
+            self.retry_delay(url, response, attempt)
+            attempt += 1
+
+
+_scheduler_lock = threading.Lock()
+_scheduler: Optional[RequestScheduler] = None
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    Get the request scheduler shared by all InvenioRDM repositories.
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler: Optional[RequestScheduler]):
+    """
+    Replace the request scheduler shared by all InvenioRDM repositories.
+
+    Passing ``None`` resets to a default scheduler, which is created on next use.
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+class HostConcurrencyLimiter:
+    """
+    Limits the number of concurrent operations per host.
+
+    Parameters
+    ----------
+    max_per_host : int
+        The maximum number of concurrent operations per host.
+    """
+
+    def __init__(self, max_per_host: int):
+        self.max_per_host = max_per_host
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str) -> threading.BoundedSemaphore:
+        """
+        Get the semaphore guarding the host of the given URL.
+
+        The returned semaphore is meant to be used as a context manager.
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
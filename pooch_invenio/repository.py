@@ -1,10 +1,72 @@
-from typing import Optional, Dict, Tuple
-from functools import cached_property, lru_cache
-from importlib.resources import files
+import contextlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Dict, Iterable, Tuple, Union
+from functools import cached_property
 
-from pooch_doi.license import *
 from pooch_doi.repository import DataRepository, DEFAULT_TIMEOUT
 
+from .cache import (
+    CacheEntry,
+    MetadataCache,
+    MetadataSnapshot,
+    ProbeCache,
+    conditional_headers,
+    response_validators,
+)
+from .coalesce import get_coalescer
+from .files import (
+    CHUNK_SIZE,
+    FileEntry,
+    FilesListingParser,
+    index_from_json,
+    index_to_json,
+)
+from .http import get_session
+from .instances import known_instances
+from .metrics import emit, endpoint_type
+from .ratelimit import get_scheduler
+from .rights import RecordRightsParser, record_rights, rights_from_metadata
+from .store import ContentStore
+
+# The license machinery and the download helpers are imported on first use,
+# so that repositories that do not handle a DOI are cheap to load
+if TYPE_CHECKING:
+    from pooch_doi.license import License
+
+    from .download import DownloadPlan
+
+# Add pooch User-Agent (see https://github.com/fatiando/pooch/issues/502)
+USER_AGENT = "pooch/1.8.2 ([https://github.com/fatiando/pooch)](https://github.com/ssciwr/pooch-invenio))"
+
+# The file index is stored in the metadata cache in a compact serialization
+_CACHE_SERIALIZATION = {"files": (index_to_json, index_from_json)}
+
+# The number of bytes that are still read from the record details once their
+# metadata was parsed, so that the connection can be reused
+_DRAIN_LIMIT = 4 * CHUNK_SIZE
+
+
+def parse_archive_url(archive_url: str) -> Optional[Tuple[str, str]]:
+    """
+    Split an archive URL of the form ``<base_url>/records/<record_id>``.
+
+    Returns
+    -------
+    base_url, record_id : Tuple[str, str] or None
+        The base URL of the instance and the record ID or ``None`` if the
+        URL does not have the expected form.
+    """
+    # Remove any trailing slashes
+    archive_url = archive_url.strip("/")
+
+    # Pre-flight check to match only <base_url>/records/<record_id> archive_urls.
+    parts = archive_url.split("/")
+    if len(parts) < 2 or parts[-2] != "records":
+        return None
+
+    return "/".join(parts[:-2]), parts[-1]
+
 
 class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-docstring
     allowed_exceptions: Tuple[type[Exception]] = ()
@@ -23,6 +85,32 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
     # during initialization. We use this to minimize the execution time.
     init_requires_requests: bool = True
 
+    # An optional persistent cache for record metadata. Assign a MetadataCache
+    # instance to enable it. As published records are immutable, a warm cache
+    # allows to resolve records without any requests to the instance.
+    metadata_cache: Optional[MetadataCache] = None
+
+    # An optional snapshot of record metadata that is consulted before any
+    # request is made. If offline is set, records that are not part of the
+    # snapshot are never requested from the instance.
+    metadata_snapshot: Optional[MetadataSnapshot] = None
+    offline: bool = False
+
+    # An optional persistent cache of whether hosts are InvenioRDM instances.
+    # Assign a ProbeCache instance to enable it. Hosts known not to be InvenioRDM
+    # instances are then rejected without a request and known instances are
+    # not probed again.
+    probe_cache: Optional[ProbeCache] = None
+
+    # An optional content-addressed store for downloaded files. Assign a
+    # ContentStore instance to enable it. Files with the same checksum are then
+    # only downloaded once across all records and versions.
+    content_store: Optional[ContentStore] = None
+
+    # Whether all metadata of a record is fetched eagerly during initialization.
+    # This costs a single round-trip instead of one per kind of metadata.
+    prefetch_metadata: bool = False
+
     @property
     def name(self) -> str:
         """
@@ -45,6 +133,9 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
         self.record_id = record_id
         self.archive_url = f"{base_url}/records/{record_id}"
         self._record_files: Optional[dict] = None
+        self._record_details: Optional[dict] = None
+        self._licenses: Optional[list] = None
+        self._prefetch_pending = False
 
     @classmethod
     def initialize(cls, doi: str, archive_url: str):
@@ -65,46 +156,311 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
             The resolved URL for the DOI
         """
 
-        # Remove any trailing slashes
-        archive_url = archive_url.strip("/")
+        parsed = parse_archive_url(archive_url)
+        if parsed is None:
+            return None
+        base_url, record_id = parsed
+
+        if cls.metadata_snapshot is not None:
+            record_files = cls.metadata_snapshot.get(base_url, record_id, "files")
+            emit("cache", layer="snapshot", kind="files", hit=record_files is not None)
+            if record_files is not None:
+                repository = cls(doi, base_url, record_id)
+                repository._record_files = record_files
+                return repository
+        if cls.offline:
+            return None
 
-        # Pre-flight check to match only <base_url>/records/<record_id> archive_urls.
-        parts = archive_url.split("/")
-        if len(parts) < 2 or parts[-2] != "records":
+        cached = cls._lookup_metadata_cache(base_url, record_id, "files")
+        if cached is not None and cached.fresh:
+            repository = cls(doi, base_url, record_id)
+            repository._record_files = cached.data
+            return repository
+
+        # Only one thread or process fetches the files listing of a record,
+        # while the others wait for the result.
+        def fetch():
+            with cls._metadata_lock(base_url, record_id, "files"):
+                return cls._initialize_from_instance(doi, base_url, record_id)
+
+        repository = get_coalescer().run((cls, base_url, record_id), fetch)
+        return repository._copy(doi) if repository is not None else None
+
+    def _copy(self, doi: str):
+        repository = type(self)(doi, self.base_url, self.record_id)
+        repository._record_files = self._record_files
+        repository._record_details = self._record_details
+        repository._licenses = self._licenses
+        repository._prefetch_pending = self._prefetch_pending
+        return repository
+
+    @classmethod
+    def _initialize_from_instance(cls, doi: str, base_url: str, record_id: str):
+        # Another process might have filled the cache while we waited for the lock
+        cached = cls._lookup_metadata_cache(base_url, record_id, "files")
+        if cached is not None and cached.fresh:
+            repository = cls(doi, base_url, record_id)
+            repository._record_files = cached.data
+            return repository
+
+        verdict = None
+        if cls.probe_cache is not None:
+            verdict = cls.probe_cache.get(base_url)
+            emit("cache", layer="probe", kind="verdict", hit=verdict is not None)
+        if verdict is False:
             return None
+        if verdict is True:
+            # The files listing is fetched (or revalidated) lazily
+            repository = cls(doi, base_url, record_id)
+            if cls.prefetch_metadata:
+                repository.prefetch()
+            return repository
+
+        # If we have an expired cache entry, we revalidate it
+        headers = conditional_headers(cached.validators) if cached is not None else None
+
+        if cls.prefetch_metadata:
+            from concurrent.futures import ThreadPoolExecutor  # pylint: disable=C0415
+
+            # Request the record details concurrently to the probe
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                details = executor.submit(
+                    cls._get_record_details_response,
+                    base_url,
+                    record_id,
+                    check_rate_limit=False,
+                )
+                response = cls._get_record_files_response(
+                    base_url,
+                    record_id,
+                    check_rate_limit=False,
+                    headers=headers,
+                    stream=True,
+                )
+                details = details.result()
+        else:
+            details = None
+            # We don't check rate limiting here because this might not be an InvenioRDM instance
+            response = cls._get_record_files_response(
+                base_url,
+                record_id,
+                check_rate_limit=False,
+                headers=headers,
+                stream=True,
+            )
 
-        base_url = "/".join(parts[:-2])
-        record_id = parts[-1]
+        repository = cls(doi, base_url, record_id)
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            cls.metadata_cache.touch(base_url, record_id, "files")
+            repository._record_files = cached.data
+            return repository
 
-        # We don't check rate limiting here because this might not be an InvenioRDM instance
-        response = cls._get_record_files_response(
-            base_url, record_id, check_rate_limit=False
-        )
+        if cls.probe_cache is not None:
+            verdict = cls._probe_verdict(response)
+            if verdict is not None:
+                cls.probe_cache.set(base_url, verdict)
 
         # If we failed, this is probably not an InvenioRDM instance
         if 400 <= response.status_code < 600:
+            response.close()
             return None
 
-        repository = cls(doi, base_url, record_id)
-        repository._record_files = response.json()
+        repository._record_files = cls._read_record_files(response)
+        repository._store_in_metadata_cache(
+            "files", repository._record_files, response_validators(response.headers)
+        )
+        if details is not None and details.ok:
+            try:
+                repository._set_record_details(
+                    details.json(), response_validators(details.headers)
+                )
+            except ValueError:
+                pass
         return repository
 
+    @staticmethod
+    def _probe_verdict(response) -> Optional[bool]:
+        # Decide from the response to the probe whether the host is an InvenioRDM
+        # instance. Rate limiting and server errors do not allow a verdict.
+        if response.status_code == 429 or response.status_code >= 500:
+            return None
+        if 200 <= response.status_code < 300:
+            return "json" in response.headers.get("Content-Type", "")
+        # InvenioRDM answers unknown records with a JSON error document of exactly
+        # this shape: {"status": 404, "message": "The persistent identifier does
+        # not exist."}. Other frameworks send error documents with the same keys
+        # among others, e.g. Spring Boot.
+        try:
+            error = response.json()
+        except ValueError:
+            return False
+        if (
+            isinstance(error, dict)
+            and set(error) == {"status", "message"}
+            and error["status"] == response.status_code
+        ):
+            return True
+        return None
+
+    def prefetch(self):
+        """
+        Fetch all metadata of the record in a single round-trip.
+
+        The record details of InvenioRDM already contain the file entries of
+        the record. If they are complete, they are used to populate the files
+        listing, so that no separate request to the files endpoint is needed.
+
+        Returns
+        -------
+        repository : InvenioRDMRepository
+            The repository itself.
+        """
+        details = self.record_details
+        if self._record_files is None:
+            self._record_files = self._load_from_metadata_cache("files")
+        if self._record_files is None:
+            files = details.get("files", dict())
+            entries = files.get("entries")
+            if (
+                isinstance(entries, dict)
+                and len(entries) == files.get("count", len(entries))
+                and all("links" in entry for entry in entries.values())
+            ):
+                self._record_files = {
+                    key: FileEntry.from_api(entry) for key, entry in entries.items()
+                }
+                self._store_in_metadata_cache("files", self._record_files)
+        return self
+
+    def _run_pending_prefetch(self):
+        # Known instances defer the prefetch to the first access of the files
+        # listing or the licenses, so that their initialization is free of requests
+        if self._prefetch_pending:
+            self._prefetch_pending = False
+            self.prefetch()
+
+    @classmethod
+    def _metadata_lock(cls, base_url: str, record_id: str, kind: str):
+        if cls.metadata_cache is None:
+            return contextlib.nullcontext()
+        return cls.metadata_cache.lock(base_url, record_id, kind)
+
+    @classmethod
+    def _lookup_metadata_cache(cls, base_url: str, record_id: str, kind: str):
+        # Recently fetched metadata is shared in memory across all instances
+        coalescer = get_coalescer()
+        data = coalescer.get((base_url, record_id, kind))
+        if coalescer.max_entries:
+            emit("cache", layer="memory", kind=kind, hit=data is not None)
+        if data is not None:
+            return CacheEntry(data=data, validators=dict(), fresh=True)
+
+        if cls.metadata_cache is None:
+            return None
+        cached = cls.metadata_cache.lookup(base_url, record_id, kind)
+        fresh = cached is not None and cached.fresh
+        emit("cache", layer="disk", kind=kind, hit=fresh)
+        if cached is not None and kind in _CACHE_SERIALIZATION:
+            cached.data = _CACHE_SERIALIZATION[kind][1](cached.data)
+        if fresh:
+            coalescer.set((base_url, record_id, kind), cached.data)
+        return cached
+
+    def _store_in_metadata_cache(
+        self, kind: str, data, validators: Optional[Dict[str, str]] = None
+    ):
+        get_coalescer().set((self.base_url, self.record_id, kind), data)
+        if self.metadata_cache is not None:
+            if kind in _CACHE_SERIALIZATION:
+                data = _CACHE_SERIALIZATION[kind][0](data)
+            self.metadata_cache.set(
+                self.base_url, self.record_id, kind, data, validators
+            )
+
+    def _load_from_metadata_cache(self, kind: str):
+        cached = self._lookup_metadata_cache(self.base_url, self.record_id, kind)
+        if cached is not None and cached.fresh:
+            return cached.data
+
+    def _fetch_metadata(self, kind: str, get_response, to_json):
+        if self.metadata_snapshot is not None:
+            data = self.metadata_snapshot.get(self.base_url, self.record_id, kind)
+            emit("cache", layer="snapshot", kind=kind, hit=data is not None)
+            if data is not None:
+                return data
+        if self.offline:
+            raise RuntimeError(
+                f"The metadata of record '{self.archive_url}' (doi:{self.doi}) is not "
+                f"available in offline mode. Please add it to the metadata snapshot."
+            )
+
+        data = self._load_from_metadata_cache(kind)
+        if data is not None:
+            return data
+
+        def fetch():
+            with self._metadata_lock(self.base_url, self.record_id, kind):
+                # Another process might have filled the cache while we waited for the lock.
+                # Expired cache entries are revalidated with a conditional request.
+                cached = self._lookup_metadata_cache(
+                    self.base_url, self.record_id, kind
+                )
+                if cached is not None and cached.fresh:
+                    return cached.data
+
+                response = get_response(
+                    conditional_headers(cached.validators)
+                    if cached is not None
+                    else None
+                )
+                if response.status_code == 304 and cached is not None:
+                    response.close()
+                    self.metadata_cache.touch(self.base_url, self.record_id, kind)
+                    get_coalescer().set(
+                        (self.base_url, self.record_id, kind), cached.data
+                    )
+                    return cached.data
+
+                data = to_json(response)
+                if response.ok:
+                    self._store_in_metadata_cache(
+                        kind, data, response_validators(response.headers)
+                    )
+                return data
+
+        # Concurrent fetches of the same metadata within this process are
+        # deduplicated
+        return get_coalescer().run((self.base_url, self.record_id, kind), fetch)
+
     @staticmethod
     def _make_request(
-        url: str, headers: Optional[Dict[str, str]] = None, check_rate_limit=True
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        check_rate_limit=True,
+        stream: bool = False,
     ):
         headers = headers if headers is not None else dict()
-        # Add pooch User-Agent (see https://github.com/fatiando/pooch/issues/502)
-        headers.update(
-            {
-                "User-Agent": "pooch/1.8.2 ([https://github.com/fatiando/pooch)](https://github.com/ssciwr/pooch-invenio))"
-            }
+        headers.update({"User-Agent": USER_AGENT})
+
+        # Rate-limited requests are retried by the scheduler. We only do so if we
+        # are supposed to check for rate limiting, as otherwise this might not even
+        # be an InvenioRDM instance.
+        # The files listing requested without retries probes the instance
+        endpoint = endpoint_type(url)
+        if endpoint == "files" and not check_rate_limit:
+            endpoint = "probe"
+
+        session = get_session()
+        r = get_scheduler().request(
+            url,
+            lambda: session.get(
+                url, headers=headers, timeout=DEFAULT_TIMEOUT, stream=stream
+            ),
+            retry=check_rate_limit,
+            endpoint=endpoint,
         )
 
-        import requests  # pylint: disable=C0415
-
-        r = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
-
         if check_rate_limit and r.status_code == 429:
             raise RuntimeError(
                 f"The request to '{url}' returned with status code {r.status_code!s}."
@@ -117,36 +473,128 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
     def _make_request_to_json(
         url: str, headers: Optional[Dict[str, str]] = None, check_rate_limit=True
     ):
+        return InvenioRDMRepository._response_to_json(
+            url,
+            InvenioRDMRepository._make_request(
+                url, headers=headers, check_rate_limit=check_rate_limit
+            ),
+        )
+
+    @staticmethod
+    def _decoding_error(url: str) -> RuntimeError:
+        return RuntimeError(
+            f"An issue occurred decoding the JSON response from '{url}'."
+            f"This should not happen."
+            f"Please open an issue at https://github.com/ssciwr/pooch-invenio/issues"
+        )
+
+    @staticmethod
+    def _response_to_json(url: str, response):
         import requests  # pylint: disable=C0415
 
         try:
-            return InvenioRDMRepository._make_request(
-                url, headers=headers, check_rate_limit=check_rate_limit
-            ).json()
+            return response.json()
         except requests.exceptions.JSONDecodeError:
-            raise RuntimeError(
-                f"An issue occurred decoding the JSON response from '{url}'."
-                f"This should not happen."
-                f"Please open an issue at https://github.com/ssciwr/pooch-invenio/issues"
-            )
+            raise InvenioRDMRepository._decoding_error(url)
+
+    @staticmethod
+    def _get_record_details_response(
+        base_url: str,
+        record_id: str,
+        check_rate_limit: bool = True,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ):
+        # We use the special mimetype to get a consistent serialization schema of records
+        # across different InvenioRDM instances.
+        return InvenioRDMRepository._make_request(
+            f"{base_url}/api/records/{record_id}",
+            headers={"Accept": "application/vnd.inveniordm.v1+json", **(headers or {})},
+            check_rate_limit=check_rate_limit,
+            stream=stream,
+        )
 
     @staticmethod
     def _get_record_files_response(
-        base_url: str, record_id: str, check_rate_limit: bool = True
+        base_url: str,
+        record_id: str,
+        check_rate_limit: bool = True,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
     ):
         return InvenioRDMRepository._make_request(
             f"{base_url}/api/records/{record_id}/files",
-            headers={"Accept": "application/json"},
+            headers={"Accept": "application/json", **(headers or {})},
             check_rate_limit=check_rate_limit,
+            stream=stream,
         )
 
+    @classmethod
+    def _read_record_files(cls, response) -> Dict[str, FileEntry]:
+        # The files listing is parsed incrementally while it is downloaded, so that
+        # large listings are never held in memory as a whole. If the instance
+        # paginates the listing, we follow the links to the next pages.
+        entries = dict()
+        while True:
+            # An error document must never be mistaken for a listing without files
+            if not response.ok:
+                response.close()
+                raise RuntimeError(
+                    f"The request to '{response.url}' returned with status code {response.status_code!s}."
+                )
+            parser = FilesListingParser(entries)
+            with response:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    parser.feed(chunk)
+            parser.close()
+
+            next_url = parser.fields.get("links", dict()).get("next")
+            if next_url is None:
+                return entries
+            response = cls._make_request(
+                next_url, headers={"Accept": "application/json"}, stream=True
+            )
+
+    @staticmethod
+    def _read_record_rights(url: str, response) -> dict:
+        # Only the metadata of the record details is decoded. Once it is parsed,
+        # a large rest of the response is not read at all.
+        # Deleted, restricted and missing records are told apart by the status
+        if not response.ok:
+            response.close()
+            raise RuntimeError(
+                f"The request to '{response.url}' returned with status code {response.status_code!s}."
+            )
+        parser = RecordRightsParser()
+        drained = 0
+        try:
+            with response:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if not parser.done:
+                        parser.feed(chunk)
+                        continue
+                    drained += len(chunk)
+                    if drained > _DRAIN_LIMIT:
+                        break
+            parser.close()
+        except ValueError:
+            raise InvenioRDMRepository._decoding_error(url)
+        if parser.metadata is None:
+            raise KeyError("metadata")
+        return rights_from_metadata(parser.metadata)
+
     @cached_property
-    def record_files(self) -> dict:
+    def record_files(self) -> Dict[str, FileEntry]:
+        self._run_pending_prefetch()
         if self._record_files is None:
-            self._record_files = self._get_record_files_response(
-                self.base_url, self.record_id
-            ).json()
-        return {entry["key"]: entry for entry in self._record_files["entries"]}
+            self._record_files = self._fetch_metadata(
+                "files",
+                lambda headers: self._get_record_files_response(
+                    self.base_url, self.record_id, headers=headers, stream=True
+                ),
+                self._read_record_files,
+            )
+        return self._record_files
 
     @cached_property
     def record_details(self):
@@ -154,13 +602,36 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
         # across different InvenioRDM instances.
         # As we already decided this is an InvenioRDM instance, we assume this request returns
         # valid json.
-        return InvenioRDMRepository._make_request_to_json(
-            f"{self.base_url}/api/records/{self.record_id}",
-            headers={"Accept": "application/vnd.inveniordm.v1+json"},
-        )
+        if self._record_details is None:
+            self._record_details = self._fetch_metadata(
+                "details",
+                lambda headers: self._get_record_details_response(
+                    self.base_url, self.record_id, headers=headers
+                ),
+                lambda response: self._response_to_json(
+                    f"{self.base_url}/api/records/{self.record_id}", response
+                ),
+            )
+        return self._record_details
+
+    def _set_record_details(
+        self, details: dict, validators: Optional[Dict[str, str]] = None
+    ):
+        self._record_details = details
+        if "metadata" in details:
+            self._store_in_metadata_cache("details", details, validators)
 
     @staticmethod
-    def _rights_entry_to_license(entry: dict) -> License:
+    def _rights_entry_to_license(entry: dict) -> "License":
+        # pylint: disable-next=C0415
+        from pooch_doi.license import (
+            License,
+            LicenseIdentifier,
+            LicenseIdentifierScheme,
+            LicenseReference,
+            LicenseReferenceRole,
+        )
+
         _empty_dict = dict()
         _empty_string = ""
         name = entry.get("title", _empty_dict).get("en", _empty_string) or entry.get(
@@ -188,17 +659,47 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
             references=references,
         )
 
-    def licenses(self):
-        copyright_notice = self.record_details["metadata"].get("copyright")
+    @staticmethod
+    def _licenses_from_rights(rights: dict) -> list:
+        copyright_notice = rights["copyright"]
 
         return list(
             (setattr(l, "copyright", copyright_notice) or l)
             for l in map(
-                InvenioRDMRepository._rights_entry_to_license,
-                self.record_details["metadata"].get("rights", list()),
+                InvenioRDMRepository._rights_entry_to_license, rights["rights"]
             )
         )
 
+    @staticmethod
+    def _licenses_from_record_details(record_details: dict) -> list:
+        return InvenioRDMRepository._licenses_from_rights(record_rights(record_details))
+
+    def _fetch_record_rights(self) -> dict:
+        self._run_pending_prefetch()
+        # If the full record details are already there, no request is needed
+        if self._record_details is not None:
+            return record_rights(self._record_details)
+        return self._fetch_metadata(
+            "rights",
+            lambda headers: self._get_record_details_response(
+                self.base_url, self.record_id, headers=headers, stream=True
+            ),
+            lambda response: self._read_record_rights(
+                f"{self.base_url}/api/records/{self.record_id}", response
+            ),
+        )
+
+    def licenses(self):
+        """
+        The licenses of the record.
+
+        Only the rights of the record are fetched and cached, not its full
+        details. The licenses are converted once per repository instance.
+        """
+        if self._licenses is None:
+            self._licenses = self._licenses_from_rights(self._fetch_record_rights())
+        return list(self._licenses)
+
     def download_url(self, file_name: str) -> str:
         """
         Use the repository API to get the download URL for a file given
@@ -215,12 +716,11 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
             The HTTP URL that can be used to download the file.
         """
         # Check if file exists in the repository
-        if file_name not in self.record_files:
-            raise ValueError(
-                f"File '{file_name}' not found in data archive "
-                f"{self.archive_url} (doi:{self.doi})."
-            )
-        return self.record_files[file_name]["links"]["content"]
+        (entry,) = self._select_files([file_name])
+        content_url = entry.content_url
+        if content_url is None:
+            raise KeyError("content")
+        return content_url
 
     def create_registry(self) -> dict[str, str]:
         """
@@ -231,13 +731,179 @@ class InvenioRDMRepository(DataRepository):  # pylint: disable=missing-class-doc
         registry : Dict[str,str]
             The registry dictionary.
         """
-        return {k: v["checksum"] for k, v in self.record_files.items()}
+        registry = dict()
+        for key, entry in self.record_files.items():
+            if entry.checksum is None:
+                raise KeyError("checksum")
+            registry[key] = entry.checksum
+        return registry
+
+    def _select_files(self, file_names: Optional[Iterable[str]]) -> list:
+        if file_names is None:
+            return list(self.record_files.values())
+        file_names = list(file_names)
+        for file_name in file_names:
+            if file_name not in self.record_files:
+                raise ValueError(
+                    f"File '{file_name}' not found in data archive "
+                    f"{self.archive_url} (doi:{self.doi})."
+                )
+        return [self.record_files[file_name] for file_name in file_names]
 
+    def latest_version(self) -> "InvenioRDMRepository":
+        """
+        Resolve the latest version of the record.
 
-@lru_cache(maxsize=1)
-def _known_inveniordm_instances() -> list[str]:
-    instances_file = files("pooch_invenio").joinpath("instances.txt")
-    return instances_file.read_text(encoding="utf-8").splitlines()
+        Returns
+        -------
+        repository : InvenioRDMRepository
+            The repository of the latest version or the repository itself if
+            this already is the latest version.
+        """
+        latest_url = self.record_details.get("links", dict()).get("latest")
+        if latest_url is None:
+            return self
+        if self.offline:
+            raise RuntimeError(
+                f"The latest version of record '{self.archive_url}' (doi:{self.doi}) "
+                f"cannot be resolved in offline mode."
+            )
+
+        details = self._make_request_to_json(
+            latest_url, headers={"Accept": "application/vnd.inveniordm.v1+json"}
+        )
+        record_id = str(details["id"])
+        if record_id == self.record_id:
+            return self
+
+        doi = details.get("pids", dict()).get("doi", dict()).get("identifier", self.doi)
+        latest = type(self)(doi, self.base_url, record_id)
+        latest._set_record_details(details)
+        return latest.prefetch()
+
+    def sync_from(
+        self,
+        previous: "InvenioRDMRepository",
+        path: Optional[Union[str, os.PathLike]] = None,
+        previous_path: Optional[Union[str, os.PathLike]] = None,
+        **kwargs,
+    ) -> Dict[str, Path]:
+        """
+        Download the files of the record, reusing the files of another version.
+
+        The registries of both versions are compared by checksum. Files whose
+        content was already downloaded for the previous version are hard-linked
+        into place and only added or changed files are downloaded. Additional
+        keyword arguments are forwarded to :meth:`download_files`.
+
+        Parameters
+        ----------
+        previous : InvenioRDMRepository
+            The repository of the version that was downloaded before, e.g.
+            ``previous.latest_version().sync_from(previous)``.
+        path : str or PathLike, optional
+            The directory to download the files to. Defaults to a directory in
+            the pooch cache named after the DOI.
+        previous_path : str or PathLike, optional
+            The directory the files of the previous version were downloaded
+            to. Defaults to a directory in the pooch cache named after its DOI.
+
+        Returns
+        -------
+        paths : Dict[str, Path]
+            The local paths of the files, keyed by file name.
+        """
+        from .download import default_download_dir  # pylint: disable=C0415
+
+        if previous_path is None:
+            previous_path = default_download_dir(previous.doi)
+        plan = previous.download_plan(previous_path)
+        sources = {
+            entry.checksum: plan.path / entry.key
+            for entry in plan.entries
+            if entry.key in plan.cached and entry.checksum is not None
+        }
+        return self.download_files(path, sources=sources, **kwargs)
+
+    def download_plan(
+        self,
+        path: Optional[Union[str, os.PathLike]] = None,
+        file_names: Optional[Iterable[str]] = None,
+    ) -> "DownloadPlan":
+        """
+        Plan the download of all or a selection of the files of the record.
+
+        The plan contains the sizes of the files and which of them were
+        already downloaded, without downloading anything.
+
+        Parameters
+        ----------
+        path : str or PathLike, optional
+            The directory to download the files to. Defaults to a directory in
+            the pooch cache named after the DOI.
+        file_names : Iterable[str], optional
+            The names of the files to download. Defaults to all files.
+
+        Returns
+        -------
+        plan : DownloadPlan
+            The download plan.
+        """
+        # pylint: disable-next=C0415
+        from .download import default_download_dir, plan_download
+
+        if path is None:
+            path = default_download_dir(self.doi)
+        return plan_download(self._select_files(file_names), path)
+
+    def download_files(
+        self,
+        path: Optional[Union[str, os.PathLike]] = None,
+        file_names: Optional[Iterable[str]] = None,
+        bulk: Optional[bool] = None,
+        **kwargs,
+    ) -> Dict[str, Path]:
+        """
+        Download all or a selection of the files of the record.
+
+        The files are downloaded concurrently and verified against the checksums
+        from the repository API. Files that were already downloaded and match
+        their checksum are not downloaded again. For records with many small
+        files, the files are extracted from the archive of the record instead,
+        which needs a single request. Additional keyword arguments are
+        forwarded to :func:`pooch_invenio.download.download_files`.
+
+        Parameters
+        ----------
+        path : str or PathLike, optional
+            The directory to download the files to. Defaults to a directory in
+            the pooch cache named after the DOI.
+        file_names : Iterable[str], optional
+            The names of the files to download. Defaults to all files.
+        bulk : bool, optional
+            Whether to download the archive of the record. If ``None`` (the
+            default), the archive is used if that is cheaper.
+
+        Returns
+        -------
+        paths : Dict[str, Path]
+            The local paths of the downloaded files, keyed by file name.
+        """
+        # pylint: disable-next=C0415
+        from .download import default_download_dir, download_files
+
+        if path is None:
+            path = default_download_dir(self.doi)
+        sizes = [entry.size for entry in self.record_files.values()]
+        kwargs.setdefault("store", self.content_store)
+        return download_files(
+            self._select_files(file_names),
+            path,
+            archive_url=f"{self.base_url}/api/records/{self.record_id}/files-archive",
+            archive_size=None if None in sizes else sum(sizes),
+            bulk=bulk,
+            **kwargs,
+        )
 
 
 class KnownInstancesInvenioRDMRepository(InvenioRDMRepository):
@@ -246,19 +912,21 @@ class KnownInstancesInvenioRDMRepository(InvenioRDMRepository):
 
     @classmethod
     def initialize(cls, doi: str, archive_url: str):
-        # Remove any trailing slashes
-        archive_url = archive_url.strip("/")
-
-        # Pre-flight check to match only <base_url>/records/<record_id> archive_urls.
-        parts = archive_url.split("/")
-        if len(parts) < 2 or parts[-2] != "records":
+        parsed = parse_archive_url(archive_url)
+        if parsed is None:
             return None
+        base_url, record_id = parsed
 
-        base_url = "/".join(parts[:-2])
-        record_id = parts[-1]
+        if cls.offline and (
+            cls.metadata_snapshot is None
+            or f"{base_url}/records/{record_id}" not in cls.metadata_snapshot
+        ):
+            return None
 
-        if any(archive_url.startswith(inst) for inst in _known_inveniordm_instances()):
-            return cls(doi, base_url, record_id)
+        if archive_url in known_instances():
+            repository = cls(doi, base_url, record_id)
+            repository._prefetch_pending = cls.prefetch_metadata
+            return repository
 
 
 # This class is not strictly needed, as it is implied in above KnownInstancesInvenioRDMRepository.
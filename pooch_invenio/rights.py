@@ -0,0 +1,117 @@
+import re
+from typing import Any, Dict, Optional
+
+from .files import IncrementalObjectParser
+
+# The characters that matter while skipping over JSON values
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r"[,}\]\s]")
+
+
+def record_rights(details: dict) -> Dict[str, Any]:
+    """
+    Extract the rights of a record from its details.
+
+    Returns
+    -------
+    rights : Dict[str, Any]
+        The ``rights`` entries and the ``copyright`` notice of the record.
+    """
+    return rights_from_metadata(details["metadata"])
+
+
+def rights_from_metadata(metadata: dict) -> Dict[str, Any]:
+    """
+    Extract the rights of a record from the ``metadata`` member of its details.
+    """
+    return {
+        "rights": metadata.get("rights", list()),
+        "copyright": metadata.get("copyright"),
+    }
+
+
+class RecordRightsParser(IncrementalObjectParser):
+    """
+    An incremental parser that extracts the metadata of an InvenioRDM record.
+
+    The response of the ``/api/records/<id>`` endpoint is fed to the parser in
+    chunks of bytes. Only the ``metadata`` member is decoded, all other members,
+    e.g. the embedded file entries, are skipped over without being decoded.
+    As soon as the metadata is complete, the rest of the response is not needed.
+
+    Attributes
+    ----------
+    metadata : dict or None
+        The ``metadata`` member of the record, once it was parsed.
+    """
+
+    _document = "record details"
+
+    def __init__(self):
+        super().__init__()
+        self.metadata: Optional[dict] = None
+        self._depth = 0
+        self._in_string = False
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the metadata was parsed.
+        """
+        return self.metadata is not None
+
+    def _member_state(self, key: str) -> str:
+        return "value" if key == "metadata" else "skip"
+
+    def _parse_member(self) -> bool:
+        if self._state == "value":
+            complete, value = self._decode_value()
+            if not complete:
+                return False
+            self.metadata = value
+        elif not self._skip_value():
+            return False
+        self._state = "member_end"
+        return True
+
+    def _skip_value(self) -> bool:
+        # Returns whether the value was skipped completely
+        buffer = self._buffer
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    return False
+                if match.group() == "\\":
+                    if match.end() == len(buffer):
+                        # The escaped character is part of the next chunk
+                        self._pos = match.start()
+                        return False
+                    self._pos = match.end() + 1
+                    continue
+                self._pos = match.end()
+                self._in_string = False
+                if self._depth == 0:
+                    return True
+            elif self._depth == 0 and buffer[self._pos] not in '"{[':
+                # A number, true, false or null
+                match = _SCALAR_END.search(buffer, self._pos)
+                self._pos = len(buffer) if match is None else match.start()
+                return match is not None or self._closed
+            else:
+                match = _STRUCTURE.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    return False
+                self._pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        return True
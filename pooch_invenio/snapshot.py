@@ -0,0 +1,135 @@
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from pooch_doi.repository import DEFAULT_TIMEOUT
+
+from .batch import resolve_records
+from .cache import MetadataSnapshot
+from .http import get_session
+from .ratelimit import get_scheduler
+from .repository import InvenioRDMRepository, parse_archive_url
+
+# The maximum number of redirects followed when resolving a DOI
+MAX_REDIRECTS = 10
+
+
+def resolve_doi(doi: str) -> str:
+    """
+    Resolve a DOI to the URL of the archive it points to.
+
+    Redirects are followed one by one through the request scheduler, so that
+    every host is throttled and rate-limited requests are retried. As soon as
+    a redirect points to an InvenioRDM archive URL, it is not followed, so
+    resolving a DOI of an InvenioRDM record usually costs no request to the
+    instance at all.
+
+    Parameters
+    ----------
+    doi : str
+        The DOI, e.g. ``"10.5281/zenodo.4924875"``.
+
+    Returns
+    -------
+    archive_url : str
+        The URL that the DOI resolves to.
+    """
+    session = get_session()
+    url = f"https://doi.org/{doi}"
+    for _ in range(MAX_REDIRECTS):
+        with get_scheduler().request(
+            url,
+            lambda url=url: session.get(
+                url, timeout=DEFAULT_TIMEOUT, stream=True, allow_redirects=False
+            ),
+        ) as response:
+            if not response.is_redirect:
+                response.raise_for_status()
+                return url
+            url = urljoin(url, response.headers["Location"])
+        if parse_archive_url(url) is not None:
+            return url
+    raise RuntimeError(f"Too many redirects resolving the DOI '{doi}'.")
+
+
+def export_snapshot(
+    records: Iterable[Union[str, Tuple[str, str]]],
+    path: Union[str, os.PathLike],
+    **kwargs,
+) -> Dict[str, Optional[Exception]]:
+    """
+    Export the metadata of the given records into a snapshot file.
+
+    If the snapshot file already exists, the records are added to it.
+    Additional keyword arguments are forwarded to
+    :func:`pooch_invenio.resolve_records`.
+
+    Parameters
+    ----------
+    records : Iterable[Union[str, Tuple[str, str]]]
+        The records to export, either given as DOI or as pair of DOI and
+        resolved archive URL.
+    path : str or PathLike
+        The snapshot file.
+
+    Returns
+    -------
+    failures : Dict[str, Optional[Exception]]
+        The DOIs that could not be exported. The value is the raised exception
+        or ``None`` if the DOI does not point to an InvenioRDM record.
+    """
+    failures = dict()
+    pairs = []
+    for record in records:
+        if isinstance(record, str):
+            try:
+                record = (record, resolve_doi(record))
+            except Exception as e:  # pylint: disable=broad-except
+                failures[record] = e
+                continue
+        pairs.append(record)
+
+    snapshot = MetadataSnapshot(path) if Path(path).exists() else MetadataSnapshot()
+    for doi, repository in resolve_records(pairs, prefetch=True, **kwargs).items():
+        if isinstance(repository, InvenioRDMRepository):
+            try:
+                snapshot.add(
+                    doi,
+                    repository.base_url,
+                    repository.record_id,
+                    repository.record_files,
+                    repository.record_details,
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                failures[doi] = e
+        else:
+            failures[doi] = repository
+
+    snapshot.write(path)
+    return failures
+
+
+def enable_offline_mode(path: Union[str, os.PathLike]):
+    """
+    Serve all InvenioRDM records from the given snapshot file.
+
+    Records that are not part of the snapshot are not handled at all, so that
+    no requests to InvenioRDM instances are made. This applies to the asyncio
+    variant in :mod:`pooch_invenio.aio` as well.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The snapshot file created with :func:`export_snapshot`.
+    """
+    InvenioRDMRepository.metadata_snapshot = MetadataSnapshot(path)
+    InvenioRDMRepository.offline = True
+
+
+def disable_offline_mode():
+    """
+    Disable the offline mode enabled with :func:`enable_offline_mode`.
+    """
+    InvenioRDMRepository.metadata_snapshot = None
+    InvenioRDMRepository.offline = False
@@ -0,0 +1,107 @@
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+from .cache import default_cache_dir
+
+
+def link_file(source: Union[str, os.PathLike], target: Union[str, os.PathLike]) -> Path:
+    """
+    Place a local file at the target path without downloading it again.
+
+    The file is hard-linked if possible and copied otherwise, e.g. if the
+    source is located on a different file system.
+
+    Returns
+    -------
+    path : Path
+        The target path.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Concurrent writers of the same target each use their own temporary file
+    part = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+    try:
+        try:
+            os.link(source, part)
+        except OSError:
+            shutil.copyfile(source, part)
+        os.replace(part, target)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    return target
+
+
+class ContentStore:
+    """
+    A local content-addressed store for files of InvenioRDM records.
+
+    Files are stored under the checksums reported by the InvenioRDM API, e.g.
+    ``md5:<hash>``. A file with the same content is only downloaded once, no
+    matter which record it is part of, and hard-linked into the download
+    directories of all records. Files placed this way share their content with
+    the store and must therefore not be modified in place.
+
+    Parameters
+    ----------
+    path : str or PathLike, optional
+        The directory to store the files in. Defaults to a directory next to
+        the pooch cache directory.
+    """
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None):
+        self.path = (
+            Path(path) if path is not None else default_cache_dir().parent / "objects"
+        )
+
+    def _object_path(self, checksum: str) -> Path:
+        algorithm, _, value = checksum.lower().partition(":")
+        if not value or not value.isalnum() or not algorithm.isalnum():
+            raise ValueError(f"Invalid checksum '{checksum}'.")
+        return self.path / algorithm / value[:2] / value
+
+    def __contains__(self, checksum: str):
+        return self._object_path(checksum).is_file()
+
+    def get(self, checksum: str) -> Optional[Path]:
+        """
+        Look up the file with the given checksum.
+
+        Returns
+        -------
+        path : Path or None
+            The path of the file in the store or ``None`` if it is not stored.
+        """
+        path = self._object_path(checksum)
+        return path if path.is_file() else None
+
+    def add(self, checksum: str, path: Union[str, os.PathLike]) -> Path:
+        """
+        Add a verified local file to the store.
+
+        Files that are already stored are left untouched.
+
+        Returns
+        -------
+        path : Path
+            The path of the file in the store.
+        """
+        target = self._object_path(checksum)
+        if not target.is_file():
+            try:
+                link_file(path, target)
+            except OSError:
+                # Another process stored the same content in the meantime
+                if not target.is_file():
+                    raise
+        return target
+
+    def clear(self):
+        """
+        Remove all files from the store.
+        """
+        for entry in self.path.glob("*/*/*"):
+            entry.unlink()
@@ -3,11 +3,51 @@ from pooch_invenio.repository import (
     InvenioRDMRepository,
     KnownInstancesInvenioRDMRepository,
 )
+from pooch_invenio.coalesce import RequestCoalescer, set_coalescer
+from pooch_invenio.ratelimit import RequestScheduler, set_scheduler
 from tests.data.zenodo_record import ZenodoTestRecord
 
 pytest_plugins = ["pooch_doi.testkit"]
 
 
+class FakeClock:
+    """A clock that only advances when sleeping"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def request_scheduler(fake_clock):
+    # Retrying rate-limited requests should not slow down the test suite
+    scheduler = RequestScheduler(clock=fake_clock, sleep=fake_clock.sleep)
+    set_scheduler(scheduler)
+    yield scheduler
+    set_scheduler(None)
+
+
+@pytest.fixture(autouse=True)
+def request_coalescer():
+    # Metadata kept in memory must not leak between tests
+    coalescer = RequestCoalescer()
+    set_coalescer(coalescer)
+    yield coalescer
+    set_coalescer(None)
+
+
 @pytest.fixture(scope="session")
 def data_repo_tester(create_data_repo_tester_type):
     return create_data_repo_tester_type(
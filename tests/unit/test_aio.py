@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import pytest
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import (
+    InvenioRDMRepository,
+    MetadataSnapshot,
+    RequestScheduler,
+    disable_offline_mode,
+    enable_offline_mode,
+    set_scheduler,
+)
+from pooch_invenio.files import FileEntry
+
+httpx = pytest.importorskip("httpx")
+
+from pooch_invenio.aio import DEFAULT_MAX_PER_HOST, AsyncInvenioRDMRepository
+
+
+def mock_client(responses):
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        status_code, json = responses[request.url.path]
+        return httpx.Response(status_code, json=json)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+def test_async_repository():
+    client, calls = mock_client(
+        {
+            ZenodoTestRecord.endpoints.files.path: (
+                200,
+                ZenodoTestRecord.endpoints.files.response,
+            ),
+            ZenodoTestRecord.endpoints.details.path: (
+                200,
+                ZenodoTestRecord.endpoints.details.response,
+            ),
+        }
+    )
+
+    async def run():
+        repo = await AsyncInvenioRDMRepository.initialize(
+            ZenodoTestRecord.doi,
+            f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}",
+            client=client,
+        )
+        return (
+            await repo.create_registry(),
+            await repo.download_url("tiny-data.txt"),
+            await repo.licenses(),
+        )
+
+    registry, url, licenses = asyncio.run(run())
+
+    assert registry == {
+        "store.zip": "md5:7008231125631739b64720d1526619ae",
+        "tiny-data.txt": "md5:70e2afd3fd7e336ae478b1e740a5f08e",
+    }
+    assert url.endswith("tiny-data.txt/content")
+    assert licenses == InvenioRDMRepository._licenses_from_record_details(
+        ZenodoTestRecord.endpoints.details.response
+    )
+    assert len(calls) == 2
+
+
+def test_async_repository_does_not_initialize():
+    client, calls = mock_client({ZenodoTestRecord.endpoints.files.path: (404, {})})
+
+    async def run():
+        return [
+            await AsyncInvenioRDMRepository.initialize(
+                ZenodoTestRecord.doi, "https://zenodo.org/somevalue/abc", client=client
+            ),
+            await AsyncInvenioRDMRepository.initialize(
+                ZenodoTestRecord.doi,
+                f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}",
+                client=client,
+            ),
+        ]
+
+    assert asyncio.run(run()) == [None, None]
+    assert len(calls) == 1
+
+
+def test_async_rate_limit():
+    scheduler = RequestScheduler(backoff_factor=0.01)
+    set_scheduler(scheduler)
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(
+            200,
+            json=ZenodoTestRecord.endpoints.details.response,
+            headers={
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(time.time() + 60),
+            },
+        ),
+    ]
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: responses.pop(0))
+    )
+    repo = AsyncInvenioRDMRepository(
+        ZenodoTestRecord.doi, ZenodoTestRecord.base_url, "1", client=client
+    )
+
+    asyncio.run(repo.record_details())
+    assert not responses
+    # The exhausted budget reported by the server pauses the host
+    assert scheduler.bucket("zenodo.org").try_acquire() > 50
+
+
+def test_async_host_concurrency():
+    running = dict(now=0, max=0)
+
+    async def counting_handler(request):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return httpx.Response(200, json=ZenodoTestRecord.endpoints.details.response)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(counting_handler))
+
+    async def run():
+        repos = [
+            AsyncInvenioRDMRepository(
+                ZenodoTestRecord.doi, ZenodoTestRecord.base_url, str(i), client=client
+            )
+            for i in range(3 * DEFAULT_MAX_PER_HOST)
+        ]
+        await asyncio.gather(*(repo.record_details() for repo in repos))
+
+    asyncio.run(run())
+    assert running["max"] == DEFAULT_MAX_PER_HOST
+
+
+def test_async_missing_record_is_not_empty():
+    client, calls = mock_client(
+        {
+            "/api/records/999/files": (
+                404,
+                {"status": 404, "message": "The persistent identifier does not exist."},
+            )
+        }
+    )
+    repo = AsyncInvenioRDMRepository(
+        ZenodoTestRecord.doi, ZenodoTestRecord.base_url, "999", client=client
+    )
+    with pytest.raises(RuntimeError, match="status code 404"):
+        asyncio.run(repo.create_registry())
+
+
+def test_async_offline_mode(tmp_path):
+    path = tmp_path / "snapshot.json"
+    snapshot = MetadataSnapshot()
+    snapshot.add(
+        ZenodoTestRecord.doi,
+        ZenodoTestRecord.base_url,
+        "1",
+        {"data.txt": FileEntry("data.txt", "md5:abc", 4, "https://example.org")},
+        ZenodoTestRecord.endpoints.details.response,
+    )
+    snapshot.add("10.5281/zenodo.2", ZenodoTestRecord.base_url, "2", dict())
+    snapshot.write(path)
+    client, calls = mock_client(dict())
+
+    async def run():
+        return (
+            await AsyncInvenioRDMRepository.initialize(
+                ZenodoTestRecord.doi, "https://zenodo.org/records/1", client=client
+            ),
+            await AsyncInvenioRDMRepository.initialize(
+                ZenodoTestRecord.doi, "https://zenodo.org/records/3", client=client
+            ),
+        )
+
+    enable_offline_mode(path)
+    try:
+        repo, missing = asyncio.run(run())
+        assert missing is None
+        assert asyncio.run(repo.create_registry()) == {"data.txt": "md5:abc"}
+        assert len(asyncio.run(repo.licenses())) == 1
+
+        # Metadata missing from the snapshot is not requested either
+        repo = AsyncInvenioRDMRepository(
+            "10.5281/zenodo.2", ZenodoTestRecord.base_url, "2", client=client
+        )
+        with pytest.raises(RuntimeError, match="offline mode"):
+            asyncio.run(repo.record_details())
+    finally:
+        disable_offline_mode()
+    assert not calls
@@ -0,0 +1,185 @@
+import json
+import shutil
+import threading
+import time
+
+import pytest
+import requests
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import (
+    InvenioRDMRepository,
+    download,
+    plan_downloads,
+    resolve_records,
+    scan_licenses,
+)
+from pooch_invenio.__main__ import main
+
+
+def test_resolve_records():
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://zenodo.org/api/records/1/files",
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        m.get("https://zenodo.org/api/records/2/files", status_code=404)
+        m.get(
+            "https://zenodo.org/api/records/3/files",
+            exc=requests.exceptions.ConnectTimeout,
+        )
+
+        result = resolve_records(
+            [
+                ("10.5281/zenodo.1", "https://zenodo.org/records/1"),
+                ("10.5281/zenodo.2", "https://zenodo.org/records/2"),
+                ("10.5281/zenodo.3", "https://zenodo.org/records/3"),
+            ]
+        )
+
+    assert isinstance(result["10.5281/zenodo.1"], InvenioRDMRepository)
+    assert len(result["10.5281/zenodo.1"].create_registry()) == 2
+    assert result["10.5281/zenodo.2"] is None
+    assert isinstance(result["10.5281/zenodo.3"], requests.exceptions.ConnectTimeout)
+
+
+def test_resolve_records_per_host_limit():
+    lock = threading.Lock()
+    in_flight = {"current": 0, "max": 0}
+
+    def files(request, context):
+        with lock:
+            in_flight["current"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        time.sleep(0.01)
+        with lock:
+            in_flight["current"] -= 1
+        return ZenodoTestRecord.endpoints.files.response
+
+    with requests_mock.Mocker() as m:
+        m.get(requests_mock.ANY, json=files)
+        result = resolve_records(
+            [(str(i), f"https://zenodo.org/records/{i}") for i in range(20)],
+            max_workers=10,
+            max_per_host=3,
+        )
+
+    assert all(isinstance(r, InvenioRDMRepository) for r in result.values())
+    assert 1 <= in_flight["max"] <= 3
+
+
+def test_plan_downloads(tmp_path, monkeypatch):
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://zenodo.org/api/records/1/files",
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        m.get(
+            "https://zenodo.org/api/records/2/files",
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        repositories = resolve_records(
+            [
+                ("10.5281/zenodo.1", "https://zenodo.org/records/1"),
+                ("10.5281/zenodo.2", "https://zenodo.org/records/2"),
+            ]
+        )
+
+    plans = plan_downloads(repositories.values(), tmp_path)
+    assert set(plans) == {"10.5281/zenodo.1", "10.5281/zenodo.2"}
+    plan = plans["10.5281/zenodo.1"]
+    assert plan.path == tmp_path / "10.5281_zenodo.1"
+    assert plan.cached == set()
+    assert plan.download_size == plan.total_size > 0
+
+    # Each record fits on its own, but not both of them together
+    free = plan.total_size + 1
+    monkeypatch.setattr(
+        download.shutil,
+        "disk_usage",
+        lambda path: shutil._ntuple_diskusage(free, 0, free),
+    )
+    plan.check_free_space()
+    with pytest.raises(RuntimeError, match="Not enough free space"):
+        plan_downloads(repositories.values(), tmp_path)
+    plan_downloads(repositories.values(), tmp_path, check_space=False)
+
+
+def mock_details(m):
+    m.get(
+        "https://zenodo.org/api/records/1",
+        json=ZenodoTestRecord.endpoints.details.response,
+    )
+    m.get("https://zenodo.org/api/records/2", status_code=404, json={})
+    m.get("https://zenodo.org/api/records/4", status_code=410, json={})
+    m.get(
+        "https://doi.org/10.5281/zenodo.1",
+        status_code=302,
+        headers={"Location": "https://zenodo.org/records/1"},
+    )
+
+
+def test_scan_licenses():
+    with requests_mock.Mocker() as m:
+        mock_details(m)
+        results = list(
+            scan_licenses(
+                [
+                    "10.5281/zenodo.1",
+                    "https://zenodo.org/records/1",
+                    ("10.5281/zenodo.2", "https://zenodo.org/records/2"),
+                    "https://example.org/datasets/3",
+                    "https://zenodo.org/records/4",
+                ],
+                max_workers=2,
+            )
+        )
+        # The files listings are never requested
+        assert not any(r.url.endswith("/files") for r in m.request_history)
+        # The DOI is resolved without requesting the landing page
+        assert all("/api/" in r.url or "doi.org" in r.url for r in m.request_history)
+
+    by_record = {r["record"]: r for r in results}
+    assert len(by_record) == 5
+    resolved = by_record["10.5281/zenodo.1"]
+    assert resolved["archive_url"] == "https://zenodo.org/records/1"
+    assert resolved["licenses"] == by_record["https://zenodo.org/records/1"]["licenses"]
+    (license,) = resolved["licenses"]
+    assert license["identifiers"][0]["scheme"] == "url"
+    assert license["references"][0]["uri"] == license["identifiers"][0]["value"]
+    assert json.loads(json.dumps(license)) == license
+
+    # Missing and deleted records are told apart
+    assert "status code 404" in by_record["10.5281/zenodo.2"]["error"]
+    assert "status code 410" in by_record["https://zenodo.org/records/4"]["error"]
+    assert by_record["https://example.org/datasets/3"]["error"] == (
+        "Not an InvenioRDM record."
+    )
+
+
+def test_scan_licenses_cli(tmp_path, capsys):
+    output = tmp_path / "licenses.jsonl"
+    with requests_mock.Mocker() as m:
+        mock_details(m)
+        assert main(["licenses", "--instance", "https://zenodo.org", "1"]) == 0
+        assert (
+            main(
+                [
+                    "licenses",
+                    "1",
+                    "2",
+                    "-o",
+                    str(output),
+                    "--instance",
+                    "https://zenodo.org/",
+                ]
+            )
+            == 1
+        )
+
+    (line,) = capsys.readouterr().out.splitlines()
+    assert json.loads(line)["archive_url"] == "https://zenodo.org/records/1"
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted("error" in r for r in results) == [False, True]
@@ -0,0 +1,27 @@
+import io
+
+from benchmarks.__main__ import print_table, run_benchmarks
+
+
+def test_benchmarks_smoke():
+    results = run_benchmarks(
+        [1, 25], rate_limit_every=3, page_size=10, records=4, concurrency=2
+    )
+
+    operations = [(r["operation"], r["files"]) for r in results]
+    assert ("initialize", 25) in operations
+    assert ("licenses", 1) in operations
+    assert operations[-1] == ("resolve_records", 10)
+
+    by_operation = {(r["operation"], r["files"]): r for r in results}
+    # The listing of 25 files is split into three pages, some pages are retried
+    assert by_operation["initialize", 25]["requests"] >= 3
+    assert by_operation["create_registry", 25]["requests"] == 0
+    # Every record is probed and its details are prefetched, which are retried
+    assert by_operation["resolve_records", 10]["requests"] > 8
+    assert by_operation["resolve_records", 10]["rate_limited"] > 0
+    assert sum(r["rate_limited"] for r in results) > 0
+
+    output = io.StringIO()
+    print_table(results, file=output)
+    assert "resolve_records" in output.getvalue()
@@ -0,0 +1,309 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import InvenioRDMRepository, MetadataCache, ProbeCache, get_scheduler
+from pooch_invenio.cache import FileLock
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = MetadataCache(tmp_path)
+    assert cache.get("https://zenodo.org", "123", "files") is None
+
+    cache.set("https://zenodo.org", "123", "files", {"entries": []})
+    assert cache.get("https://zenodo.org", "123", "files") == {"entries": []}
+
+    # Entries are keyed by base URL, record ID and kind
+    assert cache.get("https://example.org", "123", "files") is None
+    assert cache.get("https://zenodo.org", "124", "files") is None
+    assert cache.get("https://zenodo.org", "123", "details") is None
+
+    cache.clear()
+    assert cache.get("https://zenodo.org", "123", "files") is None
+
+
+def test_cache_ttl(tmp_path, monkeypatch):
+    cache = MetadataCache(tmp_path, ttl=60)
+    cache.set("https://zenodo.org", "123", "files", {"entries": []})
+    assert cache.get("https://zenodo.org", "123", "files") == {"entries": []}
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("https://zenodo.org", "123", "files") is None
+
+
+@pytest.fixture
+def metadata_cache(tmp_path, monkeypatch):
+    cache = MetadataCache(tmp_path)
+    monkeypatch.setattr(InvenioRDMRepository, "metadata_cache", cache)
+    return cache
+
+
+def test_warm_cache_requires_no_requests(metadata_cache):
+    archive_url = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+
+    # Populate the cache
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.details),
+            json=ZenodoTestRecord.endpoints.details.response,
+        )
+        repo = InvenioRDMRepository.initialize(ZenodoTestRecord.doi, archive_url)
+        registry = repo.create_registry()
+        licenses = repo.licenses()
+        assert m.call_count == 2
+
+    # With a warm cache, no requests are issued at all
+    with requests_mock.Mocker() as m:
+        repo = InvenioRDMRepository.initialize(ZenodoTestRecord.doi, archive_url)
+        assert repo.create_registry() == registry
+        assert repo.licenses() == licenses
+        assert repo.download_url("tiny-data.txt").endswith("tiny-data.txt/content")
+        assert m.call_count == 0
+
+
+def test_failed_requests_are_not_cached(metadata_cache):
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            status_code=404,
+        )
+        InvenioRDMRepository.initialize(
+            ZenodoTestRecord.doi,
+            f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}",
+        )
+
+    assert (
+        metadata_cache.get(
+            ZenodoTestRecord.base_url, ZenodoTestRecord.record_id, "files"
+        )
+        is None
+    )
+
+
+def test_revalidation(tmp_path, monkeypatch):
+    cache = MetadataCache(tmp_path, ttl=60)
+    monkeypatch.setattr(InvenioRDMRepository, "metadata_cache", cache)
+    archive_url = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+    files_url = ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            files_url,
+            json=ZenodoTestRecord.endpoints.files.response,
+            headers={"ETag": '"abc"', "Last-Modified": "Tue, 21 Mar 2023 11:02:11 GMT"},
+        )
+        registry = InvenioRDMRepository.initialize(
+            ZenodoTestRecord.doi, archive_url
+        ).create_registry()
+
+    entry = cache.lookup(ZenodoTestRecord.base_url, ZenodoTestRecord.record_id, "files")
+    assert entry.validators["ETag"] == '"abc"'
+
+    # Let the cache entry expire
+    import time
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    with requests_mock.Mocker() as m:
+        m.get(files_url, status_code=304)
+        repo = InvenioRDMRepository.initialize(ZenodoTestRecord.doi, archive_url)
+        assert repo.create_registry() == registry
+        assert m.call_count == 1
+        assert m.last_request.headers["If-None-Match"] == '"abc"'
+        assert (
+            m.last_request.headers["If-Modified-Since"]
+            == "Tue, 21 Mar 2023 11:02:11 GMT"
+        )
+
+    # Revalidating the files listing of an existing repository releases the
+    # connection of the streamed response as well
+    monkeypatch.setattr(time, "time", lambda: now + 200)
+    closed = []
+    monkeypatch.setattr(
+        requests.Response, "close", lambda self: closed.append(self.status_code)
+    )
+    with requests_mock.Mocker() as m:
+        m.get(files_url, status_code=304)
+        repo = InvenioRDMRepository(
+            ZenodoTestRecord.doi, ZenodoTestRecord.base_url, ZenodoTestRecord.record_id
+        )
+        assert repo.create_registry() == registry
+        assert m.call_count == 1
+    assert closed == [304]
+
+
+def test_probe_cache(tmp_path, monkeypatch):
+    cache = ProbeCache(tmp_path / "instances.json")
+    monkeypatch.setattr(InvenioRDMRepository, "probe_cache", cache)
+
+    with requests_mock.Mocker() as m:
+        # A host that is not an InvenioRDM instance
+        m.get("https://example.org/api/records/1/files", status_code=404, text="<html>")
+        assert (
+            InvenioRDMRepository.initialize("doi", "https://example.org/records/1")
+            is None
+        )
+        # An InvenioRDM instance that does not know the record
+        m.get(
+            "https://zenodo.org/api/records/1/files",
+            status_code=404,
+            json={
+                "status": 404,
+                "message": "The persistent identifier does not exist.",
+            },
+        )
+        assert (
+            InvenioRDMRepository.initialize("doi", "https://zenodo.org/records/1")
+            is None
+        )
+        # A rate-limited host does not allow a verdict
+        m.get("https://rodare.hzdr.de/api/records/1/files", status_code=429)
+        assert (
+            InvenioRDMRepository.initialize("doi", "https://rodare.hzdr.de/records/1")
+            is None
+        )
+        # Error documents of other frameworks merely share some keys
+        m.get(
+            "https://spring.example.org/api/records/1/files",
+            status_code=404,
+            json={"status": 404, "error": "Not Found", "message": "", "path": "/"},
+        )
+        assert (
+            InvenioRDMRepository.initialize(
+                "doi", "https://spring.example.org/records/1"
+            )
+            is None
+        )
+        assert m.call_count == 4
+
+    assert cache.get("https://spring.example.org") is None
+    assert cache.get("https://example.org") is False
+    assert cache.get("https://zenodo.org") is True
+    assert cache.get("https://rodare.hzdr.de") is None
+
+    # The verdicts are persistent and short-circuit the probe
+    monkeypatch.setattr(
+        InvenioRDMRepository, "probe_cache", ProbeCache(tmp_path / "instances.json")
+    )
+    with requests_mock.Mocker() as m:
+        assert (
+            InvenioRDMRepository.initialize("doi", "https://example.org/records/2")
+            is None
+        )
+        assert (
+            InvenioRDMRepository.initialize("doi", "https://zenodo.org/records/2")
+            is not None
+        )
+        assert m.call_count == 0
+
+    # Verdicts expire
+    import time
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + cache.ttl + 1)
+    assert cache.get("https://example.org") is None
+
+
+def test_probe_cache_shared_between_processes(tmp_path):
+    first = ProbeCache(tmp_path / "instances.json")
+    second = ProbeCache(tmp_path / "instances.json")
+    assert first.get("https://zenodo.org") is None
+    assert second.get("https://zenodo.org") is None
+
+    # Verdicts stored by one process are not lost when another one stores its own
+    first.set("https://zenodo.org", True)
+    second.set("https://example.org", False)
+    assert ProbeCache(tmp_path / "instances.json").get("https://zenodo.org") is True
+    assert ProbeCache(tmp_path / "instances.json").get("https://example.org") is False
+
+
+def test_file_lock(tmp_path):
+    path = tmp_path / "entry.lock"
+    with FileLock(path) as lock:
+        assert lock.held
+        assert path.exists()
+
+        # A second lock times out while the first one is held
+        other = FileLock(path, timeout=0)
+        assert not other.acquire()
+        assert not other.held
+    assert not path.exists()
+
+    # Abandoned lock files are removed
+    path.write_text("")
+    os.utime(path, (0, 0))
+    with FileLock(path, timeout=0) as lock:
+        assert lock.held
+
+
+def test_file_lock_heartbeat(tmp_path):
+    path = tmp_path / "entry.lock"
+    with FileLock(path, stale=0.2) as lock:
+        os.utime(path, (0, 0))
+        time.sleep(0.2)
+        # The holder keeps its lock file fresh, so it is never taken over
+        assert time.time() - path.stat().st_mtime < 0.2
+        assert not FileLock(path, timeout=0, stale=0.2).acquire()
+    assert not path.exists()
+
+
+def test_file_lock_break_race(tmp_path):
+    path = tmp_path / "entry.lock"
+    path.write_text("")
+    os.utime(path, (0, 0))
+    abandoned = path.stat()
+
+    # Another waiter broke the abandoned lock and took its own in the meantime
+    path.unlink()
+    with FileLock(path):
+        FileLock(path)._break(abandoned)
+        assert path.exists()
+    assert not path.exists()
+
+
+def test_lock_timeout_covers_retries(tmp_path):
+    scheduler = get_scheduler()
+    lock = MetadataCache(tmp_path).lock("https://zenodo.org", "1", "files")
+    assert lock.timeout > scheduler.max_retries * scheduler.max_backoff
+    assert MetadataCache(tmp_path, lock_timeout=1).lock("a", "1", "files").timeout == 1
+
+
+def test_single_flight(metadata_cache):
+    archive_url = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+
+    def files_listing(request, context):
+        # Keep the request in flight long enough for the others to queue up
+        time.sleep(0.2)
+        return ZenodoTestRecord.endpoints.files.response
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            json=files_listing,
+        )
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            repos = list(
+                executor.map(
+                    lambda _: InvenioRDMRepository.initialize(
+                        ZenodoTestRecord.doi, archive_url
+                    ),
+                    range(4),
+                )
+            )
+        assert m.call_count == 1
+
+    registries = [repo.create_registry() for repo in repos]
+    assert all(registry == registries[0] for registry in registries)
+    assert not list(metadata_cache.path.glob("*/*.lock"))
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import InvenioRDMRepository, RequestCoalescer, set_coalescer
+
+ARCHIVE_URL = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+
+
+def test_run_deduplicates_concurrent_fetches():
+    coalescer = RequestCoalescer()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(coalescer.run, "key", fetch)
+        started.wait()
+        others = [executor.submit(coalescer.run, "key", fetch) for _ in range(3)]
+        time.sleep(0.05)
+        release.set()
+        results = [first.result()] + [f.result() for f in others]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+
+    # Later fetches are not deduplicated
+    assert coalescer.run("key", lambda: "again") == "again"
+
+
+def test_run_propagates_exceptions():
+    coalescer = RequestCoalescer()
+
+    def fail():
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError, match="failed"):
+        coalescer.run("key", fail)
+    assert coalescer.run("key", lambda: "recovered") == "recovered"
+
+
+def test_lru():
+    coalescer = RequestCoalescer(max_entries=2)
+    coalescer.set("a", 1)
+    coalescer.set("b", 2)
+    assert coalescer.get("a") == 1
+    coalescer.set("c", 3)
+    assert coalescer.get("b") is None
+    assert coalescer.get("a") == 1
+    assert coalescer.get("c") == 3
+
+    coalescer.clear()
+    assert coalescer.get("a") is None
+
+    # Without entries, nothing is kept in memory
+    coalescer = RequestCoalescer()
+    coalescer.set("a", 1)
+    assert coalescer.get("a") is None
+
+
+def test_concurrent_initialize():
+    def files_listing(request, context):
+        # Keep the request in flight long enough for the others to queue up
+        time.sleep(0.2)
+        return ZenodoTestRecord.endpoints.files.response
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            json=files_listing,
+        )
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            repos = list(
+                executor.map(
+                    lambda i: InvenioRDMRepository.initialize(f"doi{i}", ARCHIVE_URL),
+                    range(4),
+                )
+            )
+        assert m.call_count == 1
+
+    assert [repo.doi for repo in repos] == [f"doi{i}" for i in range(4)]
+    assert all(repo.create_registry() == repos[0].create_registry() for repo in repos)
+
+
+def test_shared_lru():
+    set_coalescer(RequestCoalescer(max_entries=16))
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.details),
+            json=ZenodoTestRecord.endpoints.details.response,
+        )
+        first = InvenioRDMRepository.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+        licenses = first.licenses()
+        assert m.call_count == 2
+
+        # Other instances reuse the metadata kept in memory
+        second = InvenioRDMRepository.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+        assert second is not first
+        assert second.create_registry() == first.create_registry()
+        assert second.licenses() == licenses
+        assert m.call_count == 2
@@ -0,0 +1,358 @@
+import hashlib
+import io
+import shutil
+import zipfile
+
+import pytest
+import requests_mock
+
+from pooch_invenio import InvenioRDMRepository
+from pooch_invenio import download
+from pooch_invenio.download import REQUEST_COST, download_file, use_archive
+from pooch_invenio.files import FileEntry
+
+CONTENTS = {f"file{i}.txt": f"content of file {i}".encode() for i in range(5)}
+
+
+def make_archive(contents):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for key, content in contents.items():
+            archive.writestr(key, content)
+    return buffer.getvalue()
+
+
+def mock_record(m, contents=CONTENTS, checksums=None, archive=None):
+    checksums = checksums or {
+        key: f"md5:{hashlib.md5(content).hexdigest()}"
+        for key, content in contents.items()
+    }
+    m.get(
+        "https://zenodo.org/api/records/1/files",
+        json={
+            "entries": [
+                {
+                    "key": key,
+                    "checksum": checksums[key],
+                    "size": len(content),
+                    "links": {
+                        "content": f"https://zenodo.org/api/records/1/files/{key}/content"
+                    },
+                }
+                for key, content in contents.items()
+            ],
+            "links": {"archive": "https://zenodo.org/api/records/1/files-archive"},
+        },
+    )
+    for key, content in contents.items():
+        m.get(f"https://zenodo.org/api/records/1/files/{key}/content", content=content)
+    m.get(
+        "https://zenodo.org/api/records/1/files-archive",
+        content=make_archive(contents if archive is None else archive),
+    )
+    return InvenioRDMRepository.initialize("doi", "https://zenodo.org/records/1")
+
+
+def test_download_files(tmp_path):
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m)
+        paths = repo.download_files(tmp_path, bulk=False)
+        assert m.call_count == 1 + len(CONTENTS)
+
+        assert set(paths) == set(CONTENTS)
+        for key, path in paths.items():
+            assert path == tmp_path / key
+            assert path.read_bytes() == CONTENTS[key]
+        assert not list(tmp_path.glob("*.part"))
+
+        # Valid files are not downloaded again
+        repo.download_files(tmp_path)
+        assert m.call_count == 1 + len(CONTENTS)
+
+
+def test_download_archive(tmp_path):
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m)
+        paths = repo.download_files(tmp_path)
+        assert m.call_count == 2
+        assert m.last_request.url.endswith("/files-archive")
+
+        for key, path in paths.items():
+            assert path.read_bytes() == CONTENTS[key]
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(CONTENTS)
+
+
+def test_download_archive_incomplete(tmp_path):
+    with requests_mock.Mocker() as m:
+        # Files missing from the archive are downloaded individually
+        repo = mock_record(m, archive={"file0.txt": CONTENTS["file0.txt"]})
+        paths = repo.download_files(tmp_path, bulk=True)
+        assert m.call_count == 2 + len(CONTENTS) - 1
+
+        for key, path in paths.items():
+            assert path.read_bytes() == CONTENTS[key]
+
+
+def test_download_archive_checksum_mismatch(tmp_path):
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m, archive={key: b"corrupted" for key in CONTENTS})
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            repo.download_files(tmp_path, bulk=True)
+
+
+def test_use_archive():
+    small = [FileEntry(f"{i}", size=100) for i in range(10)]
+    assert use_archive(small)
+    assert not use_archive(small[:1])
+    assert not use_archive(small, archive_size=100 * REQUEST_COST)
+
+    large = [FileEntry(f"{i}", size=100 * REQUEST_COST) for i in range(10)]
+    assert not use_archive(large[:2], archive_size=10 * 100 * REQUEST_COST)
+    assert use_archive(large, archive_size=10 * 100 * REQUEST_COST)
+
+    assert not use_archive([FileEntry("a"), FileEntry("b")])
+
+
+def test_download_selected_files(tmp_path):
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m)
+        assert list(repo.download_files(tmp_path, file_names=["file1.txt"])) == [
+            "file1.txt"
+        ]
+        assert [p.name for p in tmp_path.iterdir()] == ["file1.txt"]
+
+        with pytest.raises(ValueError, match="File 'missing' not found"):
+            repo.download_files(tmp_path, file_names=["missing"])
+
+
+def test_download_checksum_mismatch(tmp_path):
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m, checksums={key: "md5:0000" for key in CONTENTS})
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            repo.download_files(tmp_path, file_names=["file1.txt"], bulk=False)
+
+    # Nothing is left behind
+    assert not list(tmp_path.iterdir())
+
+
+def test_download_outside_of_target(tmp_path):
+    from pooch_invenio.download import download_files
+
+    entry = FileEntry("../evil.txt", content_url="https://zenodo.org/evil")
+    with pytest.raises(ValueError, match="Refusing"):
+        download_files([entry], tmp_path / "data")
+
+
+LARGE = bytes(range(256)) * 40
+LARGE_ENTRY = FileEntry(
+    "large.bin",
+    checksum=f"md5:{hashlib.md5(LARGE).hexdigest()}",
+    size=len(LARGE),
+    content_url="https://zenodo.org/api/records/1/files/large.bin/content",
+)
+
+
+def ranged_content(request, context):
+    # Serve byte ranges of the form "bytes=<start>-[<end>]"
+    if "Range" not in request.headers:
+        return LARGE
+    start, _, end = request.headers["Range"][len("bytes=") :].partition("-")
+    end = int(end) if end else len(LARGE) - 1
+    context.status_code = 206
+    context.headers["Content-Range"] = f"bytes {start}-{end}/{len(LARGE)}"
+    return LARGE[int(start) : end + 1]
+
+
+def test_download_resume(tmp_path):
+    (tmp_path / "large.bin.part").write_bytes(LARGE[:1000])
+    with requests_mock.Mocker() as m:
+        m.get(LARGE_ENTRY.content_url, content=ranged_content)
+        download_file(LARGE_ENTRY, tmp_path / "large.bin")
+        assert m.last_request.headers["Range"] == "bytes=1000-"
+
+    assert (tmp_path / "large.bin").read_bytes() == LARGE
+    assert not (tmp_path / "large.bin.part").exists()
+
+
+@pytest.mark.parametrize("stale_size", [1000, len(LARGE)])
+def test_download_resume_stale_part(tmp_path, stale_size):
+    # A leftover of another version of the file is discarded
+    (tmp_path / "large.bin.part").write_bytes(b"x" * stale_size)
+    with requests_mock.Mocker() as m:
+        m.get(LARGE_ENTRY.content_url, content=ranged_content)
+        download_file(LARGE_ENTRY, tmp_path / "large.bin")
+        assert "Range" not in m.last_request.headers
+
+    assert (tmp_path / "large.bin").read_bytes() == LARGE
+    assert not (tmp_path / "large.bin.part").exists()
+
+
+def test_download_resume_unsupported(tmp_path):
+    (tmp_path / "large.bin.part").write_bytes(LARGE[:1000])
+    with requests_mock.Mocker() as m:
+        # The server ignores the range and sends the whole file
+        m.get(LARGE_ENTRY.content_url, content=LARGE)
+        download_file(LARGE_ENTRY, tmp_path / "large.bin")
+
+    assert (tmp_path / "large.bin").read_bytes() == LARGE
+
+
+def test_download_segmented(tmp_path):
+    with requests_mock.Mocker() as m:
+        m.get(LARGE_ENTRY.content_url, content=ranged_content)
+        download_file(
+            LARGE_ENTRY, tmp_path / "large.bin", segments=4, segment_size=1000
+        )
+        assert m.call_count == 11
+        assert all("Range" in r.headers for r in m.request_history)
+
+    assert (tmp_path / "large.bin").read_bytes() == LARGE
+    assert [p.name for p in tmp_path.iterdir()] == ["large.bin"]
+
+
+def test_download_segmented_resume(tmp_path):
+    part = tmp_path / "large.bin.part"
+    part.write_bytes(LARGE[:3000] + bytes(len(LARGE) - 3000))
+    (tmp_path / "large.bin.part.json").write_text(
+        '{"segment_size": 1000, "done": [0, 1000, 2000]}'
+    )
+    with requests_mock.Mocker() as m:
+        m.get(LARGE_ENTRY.content_url, content=ranged_content)
+        download_file(
+            LARGE_ENTRY, tmp_path / "large.bin", segments=4, segment_size=1000
+        )
+        assert m.call_count == 8
+
+    assert (tmp_path / "large.bin").read_bytes() == LARGE
+
+
+def test_download_segmented_resume_default(tmp_path):
+    part = tmp_path / "large.bin.part"
+    part.write_bytes(LARGE[:3000] + bytes(len(LARGE) - 3000))
+    (tmp_path / "large.bin.part.json").write_text(
+        '{"segment_size": 1000, "done": [0, 1000, 2000]}'
+    )
+    with requests_mock.Mocker() as m:
+        m.get(LARGE_ENTRY.content_url, content=ranged_content)
+        # The preallocated partial download is not mistaken for a complete one
+        download_file(LARGE_ENTRY, tmp_path / "large.bin")
+        assert m.call_count == 8
+
+    assert (tmp_path / "large.bin").read_bytes() == LARGE
+    assert [p.name for p in tmp_path.iterdir()] == ["large.bin"]
+
+
+def test_download_plan(tmp_path):
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m)
+        repo.download_files(tmp_path, file_names=["file0.txt"])
+        (tmp_path / "file1.txt").write_bytes(b"corrupted")
+
+        plan = repo.download_plan(tmp_path)
+        assert plan.path == tmp_path
+        assert plan.sizes == {key: len(content) for key, content in CONTENTS.items()}
+        assert plan.cached == {"file0.txt"}
+        assert [entry.key for entry in plan.missing] == [
+            f"file{i}.txt" for i in range(1, 5)
+        ]
+        assert plan.total_size == sum(len(c) for c in CONTENTS.values())
+        assert plan.download_size == plan.total_size - len(CONTENTS["file0.txt"])
+
+
+def test_download_free_space(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        download.shutil, "disk_usage", lambda path: shutil._ntuple_diskusage(0, 0, 20)
+    )
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m)
+        with pytest.raises(RuntimeError, match="Not enough free space"):
+            repo.download_files(tmp_path / "data")
+
+        # Nothing was downloaded
+        assert m.call_count == 1
+        assert not (tmp_path / "data").exists()
+
+        repo.download_files(tmp_path / "data", file_names=["file0.txt"])
+
+
+def test_download_free_space_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        download.shutil, "disk_usage", lambda path: shutil._ntuple_diskusage(0, 0, 40)
+    )
+    file_names = ["file0.txt", "file1.txt"]
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m)
+        # The archive is stored next to the extracted files
+        with pytest.raises(RuntimeError, match="Not enough free space"):
+            repo.download_files(tmp_path, file_names=file_names, bulk=True)
+        assert m.call_count == 1
+
+        repo.download_files(tmp_path, file_names=file_names, bulk=False)
+        assert m.call_count == 1 + len(file_names)
+
+
+def file_entries(record_id, contents):
+    return {
+        key: {
+            "key": key,
+            "checksum": f"md5:{hashlib.md5(content).hexdigest()}",
+            "size": len(content),
+            "links": {
+                "content": f"https://zenodo.org/api/records/{record_id}/files/{key}/content"
+            },
+        }
+        for key, content in contents.items()
+    }
+
+
+def test_sync_versions(tmp_path):
+    new_contents = dict(CONTENTS)
+    new_contents["file1.txt"] = b"changed content"
+    new_contents["file5.txt"] = b"added content"
+
+    with requests_mock.Mocker() as m:
+        repo = mock_record(m)
+        repo.download_files(tmp_path / "v1", bulk=False)
+
+        m.get(
+            "https://zenodo.org/api/records/1",
+            json={
+                "id": "1",
+                "links": {"latest": "https://zenodo.org/api/records/1/versions/latest"},
+            },
+        )
+        m.get(
+            "https://zenodo.org/api/records/1/versions/latest",
+            json={
+                "id": "2",
+                "pids": {"doi": {"identifier": "10.5281/zenodo.2"}},
+                "files": {
+                    "count": len(new_contents),
+                    "entries": file_entries(2, new_contents),
+                },
+            },
+        )
+        for key, content in new_contents.items():
+            m.get(
+                f"https://zenodo.org/api/records/2/files/{key}/content",
+                content=content,
+            )
+
+        latest = repo.latest_version()
+        assert latest.doi == "10.5281/zenodo.2"
+        assert latest.record_id == "2"
+        assert latest.latest_version() is latest
+
+        m.reset_mock()
+        paths = latest.sync_from(
+            repo, path=tmp_path / "v2", previous_path=tmp_path / "v1", bulk=False
+        )
+        assert sorted(r.url.split("/")[-2] for r in m.request_history) == [
+            "file1.txt",
+            "file5.txt",
+        ]
+
+    for key, path in paths.items():
+        assert path.read_bytes() == new_contents[key]
+    assert (tmp_path / "v1" / "file1.txt").read_bytes() == CONTENTS["file1.txt"]
+    assert (tmp_path / "v2" / "file0.txt").samefile(tmp_path / "v1" / "file0.txt")
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import InvenioRDMRepository
+from pooch_invenio.files import (
+    FileEntry,
+    FilesListingParser,
+    index_from_json,
+    index_to_json,
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000, 1000000])
+def test_files_listing_parser(chunk_size):
+    raw = json.dumps(ZenodoTestRecord.endpoints.files.response, indent=2).encode()
+
+    parser = FilesListingParser()
+    for i in range(0, len(raw), chunk_size):
+        parser.feed(raw[i : i + chunk_size])
+    parser.close()
+
+    assert list(parser.entries) == ["store.zip", "tiny-data.txt"]
+    assert parser.entries["store.zip"].size == 780
+    assert parser.fields["enabled"] is True
+    assert parser.fields["links"] == ZenodoTestRecord.endpoints.files.response["links"]
+    assert "entries" not in parser.fields
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        [b'{"n": 1000.', b'5, "entries": []}'],
+        [b'{"n": 1', b"e3, ", b'"entries": []}'],
+        [b'{"n": -', b"2}"],
+        [b'{"n": tr', b"ue}"],
+        [b'{"n": 12', b"}"],
+    ],
+)
+def test_files_listing_parser_scalar_at_chunk_boundary(chunks):
+    parser = FilesListingParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    assert parser.fields["n"] == json.loads(b"".join(chunks))["n"]
+
+
+@pytest.mark.parametrize(
+    "raw", [b'{"entries": [', b'["entries"]', b"{} trailing", b'{"entries": 3}']
+)
+def test_files_listing_parser_invalid(raw):
+    parser = FilesListingParser()
+    with pytest.raises(ValueError):
+        parser.feed(raw)
+        parser.close()
+
+
+def test_file_entry():
+    raw = ZenodoTestRecord.endpoints.files.response["entries"][1]
+    entry = FileEntry.from_api(raw)
+    assert entry.key == "tiny-data.txt"
+    assert entry.checksum == raw["checksum"]
+    assert entry.size == 59
+    assert entry.content_url == raw["links"]["content"]
+
+    # Only the needed fields are kept
+    assert not hasattr(entry, "__dict__")
+
+    # Missing fields are tolerated
+    assert FileEntry.from_api({"key": "a"}) == FileEntry("a")
+
+    index = {entry.key: entry}
+    assert index_from_json(index_to_json(index)) == index
+
+
+def test_paginated_files_listing():
+    first, second = ZenodoTestRecord.endpoints.files.response["entries"]
+    files_url = ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            files_url,
+            json={"entries": [first], "links": {"next": f"{files_url}?page=2"}},
+        )
+        m.get(f"{files_url}?page=2", json={"entries": [second], "links": {}})
+        repo = InvenioRDMRepository.initialize(
+            ZenodoTestRecord.doi,
+            f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}",
+        )
+        assert repo.create_registry() == {
+            "store.zip": "md5:7008231125631739b64720d1526619ae",
+            "tiny-data.txt": "md5:70e2afd3fd7e336ae478b1e740a5f08e",
+        }
+        assert m.call_count == 2
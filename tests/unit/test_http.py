@@ -0,0 +1,42 @@
+import requests
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import InvenioRDMRepository
+from pooch_invenio.http import configure_session, get_session, set_session
+
+
+def test_session_is_shared():
+    assert get_session() is get_session()
+
+
+def test_configure_session():
+    session = get_session()
+    configure_session(pool_maxsize=4, host_pool_maxsize={"https://zenodo.org": 20})
+    try:
+        new_session = get_session()
+        assert new_session is not session
+        assert new_session.get_adapter("https://example.org")._pool_maxsize == 4
+        assert new_session.get_adapter("https://zenodo.org/api")._pool_maxsize == 20
+    finally:
+        configure_session(pool_maxsize=10, host_pool_maxsize={})
+
+
+def test_inject_session():
+    session = requests.Session()
+    set_session(session)
+    try:
+        with requests_mock.Mocker(session=session) as m:
+            m.get(
+                ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+                json=ZenodoTestRecord.endpoints.files.response,
+            )
+            repo = InvenioRDMRepository.initialize(
+                ZenodoTestRecord.doi,
+                f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}",
+            )
+            assert repo is not None
+            assert m.call_count == 1
+    finally:
+        set_session(None)
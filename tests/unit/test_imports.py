@@ -0,0 +1,19 @@
+import pytest
+
+import pooch_invenio
+from benchmarks.imports import SCENARIOS, measure_import
+
+
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+def test_lazy_imports(scenario):
+    # Neither requests nor the license machinery is needed to discover the
+    # plugin or to turn down a DOI it does not handle
+    result = measure_import(scenario, SCENARIOS[scenario], repeat=1)
+    assert result["heavy"] == []
+
+
+def test_lazy_attributes():
+    assert pooch_invenio.InvenioRDMRepository.__name__ == "InvenioRDMRepository"
+    assert set(pooch_invenio.__all__) == set(dir(pooch_invenio))
+    with pytest.raises(AttributeError, match="does_not_exist"):
+        pooch_invenio.does_not_exist  # pylint: disable=pointless-statement
@@ -1,5 +1,16 @@
+import pytest
+
 from tests.data.zenodo_record import ZenodoTestRecord
-from pooch_invenio import KnownInstancesInvenioRDMRepository
+from pooch_invenio import KnownInstancesInvenioRDMRepository, register_instance
+from pooch_invenio.instances import InstanceIndex, known_instances
+
+
+@pytest.fixture
+def fresh_known_instances():
+    # Registered instances must not leak into other tests
+    known_instances.cache_clear()
+    yield
+    known_instances.cache_clear()
 
 
 def test_sanity_checks(sanity_check_data_repo):
@@ -26,3 +37,36 @@ def test_initialize(known_instances_data_repo_tester):
     known_instances_data_repo_tester(
         archive_base_url="https://zenodo.org"
     ).assert_repo_does_initialize(archive_path=ZenodoTestRecord.archive_path)
+
+
+def test_instance_index():
+    index = InstanceIndex(
+        [
+            "http://opendata.cern.ch/",
+            "https://ddd.uab.cat/?ln=en",
+            "https://data.caltech.edu",
+            "https://www.fdr.uni-hamburg.de/",
+            "https://uni-tuebingen.de/en/134314",
+        ]
+    )
+
+    # Schemes, query strings and a leading www. are normalized
+    assert "https://opendata.cern.ch/records/1" in index
+    assert "https://ddd.uab.cat/records/1" in index
+    assert "https://fdr.uni-hamburg.de/records/1" in index
+
+    # Hosts are matched as a whole
+    assert "https://data.caltech.edu.example.org/records/1" not in index
+
+    # Path prefixes are matched segment-wise
+    assert "https://uni-tuebingen.de/en/134314/records/1" in index
+    assert "https://uni-tuebingen.de/en/1343145/records/1" not in index
+    assert "https://uni-tuebingen.de/records/1" not in index
+
+
+def test_register_instance(fresh_known_instances):
+    archive_url = "https://data.example.org/records/1"
+    assert KnownInstancesInvenioRDMRepository.initialize("doi", archive_url) is None
+
+    register_instance("https://data.example.org")
+    assert KnownInstancesInvenioRDMRepository.initialize("doi", archive_url) is not None
@@ -0,0 +1,128 @@
+import pytest
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import (
+    InvenioRDMRepository,
+    MetadataCache,
+    Metrics,
+    add_hook,
+    remove_hook,
+)
+from pooch_invenio.metrics import Histogram, endpoint_type
+
+ARCHIVE_URL = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics()
+    add_hook(metrics)
+    yield metrics
+    remove_hook(metrics)
+
+
+def test_endpoint_type():
+    assert endpoint_type("https://zenodo.org/api/records/1") == "details"
+    assert endpoint_type("https://zenodo.org/api/records/1/files") == "files"
+    assert endpoint_type("https://zenodo.org/api/records/1/files?page=2") == "files"
+    assert (
+        endpoint_type("https://zenodo.org/api/records/1/files/a/b.txt/content")
+        == "content"
+    )
+    assert endpoint_type("https://zenodo.org/api/records/1/files-archive") == "archive"
+    assert (
+        endpoint_type("https://zenodo.org/api/records/1/versions/latest") == "details"
+    )
+    assert endpoint_type("https://zenodo.org/records/1") == "other"
+    assert endpoint_type("https://doi.org/10.5281/zenodo.1") == "other"
+
+
+def test_histogram():
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+
+
+def test_request_metrics(metrics):
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.details),
+            [
+                {"status_code": 429, "headers": {"Retry-After": "1"}},
+                {"json": ZenodoTestRecord.endpoints.details.response},
+            ],
+        )
+        repo = InvenioRDMRepository.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+        repo.licenses()
+
+    assert metrics.requests == {
+        ("probe", "zenodo.org", 200): 1,
+        ("details", "zenodo.org", 429): 1,
+        ("details", "zenodo.org", 200): 1,
+    }
+    assert metrics.latency["details", "zenodo.org"].count == 2
+    assert metrics.rate_limits == {"zenodo.org": 1}
+
+    text = metrics.to_prometheus()
+    assert (
+        'pooch_invenio_requests_total{endpoint="probe",host="zenodo.org",status="200"} 1'
+        in text
+    )
+    assert (
+        'pooch_invenio_request_seconds_count{endpoint="details",host="zenodo.org"} 2'
+        in text
+    )
+    assert 'pooch_invenio_rate_limited_total{host="zenodo.org"} 1' in text
+
+    metrics.reset()
+    assert not metrics.requests
+
+
+def test_cache_metrics(metrics, tmp_path, monkeypatch):
+    monkeypatch.setattr(InvenioRDMRepository, "metadata_cache", MetadataCache(tmp_path))
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        InvenioRDMRepository.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+        InvenioRDMRepository.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+
+    assert metrics.cache[("disk", "files", False)] >= 1
+    assert metrics.cache[("disk", "files", True)] == 1
+    assert 'layer="disk",kind="files",result="hit"' in metrics.to_prometheus()
+
+
+def test_hooks():
+    events = []
+
+    def hook(event, fields):
+        events.append((event, fields))
+
+    add_hook(hook)
+    try:
+        with requests_mock.Mocker() as m:
+            m.get(
+                ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+                status_code=404,
+            )
+            InvenioRDMRepository.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+    finally:
+        remove_hook(hook)
+
+    assert len(events) == 1
+    event, fields = events[0]
+    assert event == "request"
+    assert fields["endpoint"] == "probe"
+    assert fields["status"] == 404
+    assert fields["url"] == ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files)
+    assert fields["seconds"] >= 0
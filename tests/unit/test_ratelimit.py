@@ -0,0 +1,138 @@
+import email.utils
+import threading
+import time
+import types
+from unittest import mock
+
+import pytest
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import InvenioRDMRepository
+from pooch_invenio.ratelimit import (
+    TokenBucket,
+    parse_rate_limit_headers,
+    parse_retry_after,
+)
+
+
+def test_token_bucket(fake_clock):
+    bucket = TokenBucket(
+        rate=2.0, capacity=2.0, clock=fake_clock, sleep=fake_clock.sleep
+    )
+
+    # The burst is served immediately
+    bucket.acquire()
+    bucket.acquire()
+    assert fake_clock.now == 0.0
+
+    # Afterwards, we get one token every half second
+    bucket.acquire()
+    assert fake_clock.now == pytest.approx(0.5)
+
+    # Pausing the bucket delays all tokens
+    bucket.pause(10.0)
+    bucket.acquire()
+    assert fake_clock.now == pytest.approx(10.5)
+
+
+def test_token_bucket_update(fake_clock):
+    bucket = TokenBucket(clock=fake_clock, sleep=fake_clock.sleep)
+
+    # The server tells us the budget is exhausted for the next 30 seconds
+    bucket.update(remaining=0, reset=30.0)
+    bucket.acquire()
+    assert fake_clock.now == pytest.approx(30.0)
+
+    # The remaining budget is spread across the window
+    bucket.update(remaining=10, reset=20.0)
+    assert bucket.rate == pytest.approx(0.5)
+
+
+def test_token_bucket_waits_without_lock():
+    bucket = TokenBucket()
+    bucket.pause(0.5)
+    waiting = threading.Thread(target=bucket.acquire)
+    waiting.start()
+    time.sleep(0.05)
+
+    # A thread waiting for a token does not block others from looking
+    start = time.monotonic()
+    assert bucket.try_acquire() > 0
+    assert time.monotonic() - start < 0.1
+    waiting.join()
+
+
+def test_retry_delay(request_scheduler, fake_clock):
+    response = types.SimpleNamespace(headers={"Retry-After": "10"})
+    delay = request_scheduler.retry_delay("https://zenodo.org/api", response, 0)
+    assert 10.0 <= delay <= 10.0 + request_scheduler.backoff_factor
+    assert request_scheduler.bucket("zenodo.org").try_acquire() == pytest.approx(delay)
+
+    response = types.SimpleNamespace(headers=dict())
+    delay = request_scheduler.retry_delay("https://zenodo.org/api", response, 3)
+    assert 4.0 <= delay <= 8.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("garbage") is None
+    assert parse_retry_after("12") == 12.0
+    date = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 < parse_retry_after(date) <= 60
+
+
+def test_parse_rate_limit_headers():
+    assert parse_rate_limit_headers({}) == (None, None)
+    remaining, reset = parse_rate_limit_headers(
+        {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": str(time.time() + 60)}
+    )
+    assert remaining == 5
+    assert 55 < reset <= 60
+
+
+def test_retry_rate_limited_request(fake_clock):
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            [
+                {"status_code": 429, "headers": {"Retry-After": "7"}},
+                {"status_code": 429},
+                {"json": ZenodoTestRecord.endpoints.files.response},
+            ],
+        )
+        repo = InvenioRDMRepository(
+            ZenodoTestRecord.doi, ZenodoTestRecord.base_url, ZenodoTestRecord.record_id
+        )
+        assert len(repo.create_registry()) == 2
+        assert m.call_count == 3
+
+    # We waited at least as long as the server told us to
+    assert fake_clock.now >= 7.0
+
+
+def test_rate_limited_responses_are_closed(request_scheduler):
+    responses = [
+        mock.Mock(status_code=429, headers={"Retry-After": "0"}),
+        mock.Mock(status_code=200, headers=dict()),
+    ]
+    sent = list(responses)
+    response = request_scheduler.request("https://zenodo.org/api", lambda: sent.pop(0))
+    assert response is responses[1]
+    responses[0].close.assert_called_once()
+    responses[1].close.assert_not_called()
+
+
+def test_exhausted_retries(request_scheduler):
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            status_code=429,
+        )
+        repo = InvenioRDMRepository(
+            ZenodoTestRecord.doi, ZenodoTestRecord.base_url, ZenodoTestRecord.record_id
+        )
+        with pytest.raises(RuntimeError, match="rate-limited"):
+            repo.create_registry()
+        assert m.call_count == request_scheduler.max_retries + 1
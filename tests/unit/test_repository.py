@@ -1,9 +1,10 @@
 import pytest
+import requests_mock
 
 from tests.data.zenodo_record import ZenodoTestRecord
 
 from pooch_doi.license import *
-from pooch_invenio import InvenioRDMRepository
+from pooch_invenio import InvenioRDMRepository, KnownInstancesInvenioRDMRepository
 
 
 def test_sanity_checks(sanity_check_data_repo):
@@ -254,6 +255,21 @@ create_registry_testcases = [
 ]
 
 
+def test_missing_record_is_not_empty():
+    repo = InvenioRDMRepository(ZenodoTestRecord.doi, ZenodoTestRecord.base_url, "999")
+    with requests_mock.Mocker() as m:
+        m.get(
+            f"{ZenodoTestRecord.base_url}/api/records/999/files",
+            status_code=404,
+            json={
+                "status": 404,
+                "message": "The persistent identifier does not exist.",
+            },
+        )
+        with pytest.raises(RuntimeError, match="status code 404"):
+            repo.create_registry()
+
+
 @pytest.mark.parametrize("always_mock,json_resp,result", create_registry_testcases)
 def test_create_registry(data_repo_tester, always_mock, json_resp, result):
     repo_tester = data_repo_tester()
@@ -267,3 +283,36 @@ def test_create_registry(data_repo_tester, always_mock, json_resp, result):
                 repo_tester.repo.create_registry()
         else:
             assert repo_tester.repo.create_registry() == result
+
+
+def test_prefetch(monkeypatch):
+    archive_url = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+
+    for cls, initialize_requests, requests_issued in [
+        # The probe and the record details are requested concurrently
+        (InvenioRDMRepository, 2, 2),
+        # Known instances are initialized without requests and the files
+        # listing is taken from the record details
+        (KnownInstancesInvenioRDMRepository, 0, 1),
+    ]:
+        monkeypatch.setattr(cls, "prefetch_metadata", True)
+        with requests_mock.Mocker() as m:
+            m.get(
+                ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+                json=ZenodoTestRecord.endpoints.files.response,
+            )
+            m.get(
+                ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.details),
+                json=ZenodoTestRecord.endpoints.details.response,
+            )
+            repo = cls.initialize(ZenodoTestRecord.doi, archive_url)
+            assert m.call_count == initialize_requests
+
+            assert repo.create_registry() == {
+                "store.zip": "md5:7008231125631739b64720d1526619ae",
+                "tiny-data.txt": "md5:70e2afd3fd7e336ae478b1e740a5f08e",
+            }
+            assert repo.download_url("tiny-data.txt").endswith("tiny-data.txt/content")
+            assert len(repo.licenses()) == 1
+            assert m.call_count == requests_issued
+        monkeypatch.undo()
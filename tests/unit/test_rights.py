@@ -0,0 +1,88 @@
+import json
+
+import pytest
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import InvenioRDMRepository
+from pooch_invenio.rights import RecordRightsParser, record_rights
+
+ARCHIVE_URL = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+
+DETAILS = {
+    "id": "123",
+    "revision_id": 7,
+    "is_published": True,
+    "files": {
+        "entries": {
+            'tricky "name" [with] {brackets}\\': {"size": 3, "links": {}},
+            "naïve.txt": {"size": -1.5e3, "checksum": None},
+        },
+        "count": 2,
+    },
+    "metadata": {
+        "title": "Record",
+        "copyright": "© The authors",
+        "rights": [{"id": "cc-by-4.0", "props": {"url": "https://example.org"}}],
+    },
+    "stats": {"views": 1000},
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000, 1000000])
+def test_record_rights_parser(chunk_size):
+    raw = json.dumps(DETAILS, indent=2, ensure_ascii=False).encode()
+
+    parser = RecordRightsParser()
+    for i in range(0, len(raw), chunk_size):
+        parser.feed(raw[i : i + chunk_size])
+    parser.close()
+
+    assert parser.done
+    assert parser.metadata == DETAILS["metadata"]
+    assert record_rights(DETAILS) == {
+        "rights": DETAILS["metadata"]["rights"],
+        "copyright": "© The authors",
+    }
+
+
+def test_record_rights_parser_stops_after_metadata():
+    parser = RecordRightsParser()
+    parser.feed(json.dumps({"metadata": {"rights": []}, "files": {}}).encode()[:-5])
+    assert parser.metadata == {"rights": []}
+    parser.feed(b"not even json")
+    parser.close()
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [b'{"files": {"entries": ', b'["metadata"]', b'{"id": "1"} trailing'],
+)
+def test_record_rights_parser_invalid(raw):
+    parser = RecordRightsParser()
+    with pytest.raises(ValueError):
+        parser.feed(raw)
+        parser.close()
+
+
+def test_licenses_are_cached():
+    with requests_mock.Mocker() as m:
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+            json=ZenodoTestRecord.endpoints.files.response,
+        )
+        m.get(
+            ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.details),
+            json=ZenodoTestRecord.endpoints.details.response,
+        )
+        repo = InvenioRDMRepository.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+        licenses = repo.licenses()
+        assert licenses == InvenioRDMRepository._licenses_from_record_details(
+            ZenodoTestRecord.endpoints.details.response
+        )
+        assert repo.licenses() == licenses
+        assert m.call_count == 2
+
+    # Only the rights are kept, not the full record details
+    assert repo._record_details is None
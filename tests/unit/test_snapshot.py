@@ -0,0 +1,118 @@
+import pytest
+import requests
+import requests_mock
+
+from tests.data.zenodo_record import ZenodoTestRecord
+
+from pooch_invenio import (
+    InvenioRDMRepository,
+    KnownInstancesInvenioRDMRepository,
+    MetadataSnapshot,
+    disable_offline_mode,
+    enable_offline_mode,
+    export_snapshot,
+)
+from pooch_invenio.__main__ import main
+from pooch_invenio.snapshot import resolve_doi
+
+ARCHIVE_URL = f"{ZenodoTestRecord.base_url}{ZenodoTestRecord.archive_path}"
+
+
+def mock_record(m):
+    m.get(
+        ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.files),
+        json=ZenodoTestRecord.endpoints.files.response,
+    )
+    m.get(
+        ZenodoTestRecord.url_for(ZenodoTestRecord.endpoints.details),
+        json=ZenodoTestRecord.endpoints.details.response,
+    )
+    m.get("https://zenodo.org/api/records/1/files", status_code=404)
+
+
+@pytest.fixture
+def offline():
+    yield enable_offline_mode
+    disable_offline_mode()
+
+
+def test_export_snapshot(tmp_path, offline):
+    path = tmp_path / "snapshot.json"
+    with requests_mock.Mocker() as m:
+        mock_record(m)
+        failures = export_snapshot(
+            [
+                (ZenodoTestRecord.doi, ARCHIVE_URL),
+                ("10.5281/zenodo.1", "https://zenodo.org/records/1"),
+            ],
+            path,
+        )
+        registry = InvenioRDMRepository.initialize(
+            ZenodoTestRecord.doi, ARCHIVE_URL
+        ).create_registry()
+    assert failures == {"10.5281/zenodo.1": None}
+
+    snapshot = MetadataSnapshot(path)
+    assert len(snapshot) == 1
+    assert ARCHIVE_URL in snapshot
+
+    offline(path)
+    with requests_mock.Mocker() as m:
+        for cls in (InvenioRDMRepository, KnownInstancesInvenioRDMRepository):
+            repo = cls.initialize(ZenodoTestRecord.doi, ARCHIVE_URL)
+            assert repo.create_registry() == registry
+            assert repo.download_url("tiny-data.txt").endswith("tiny-data.txt/content")
+            assert len(repo.licenses()) == 1
+
+            # Records that are not in the snapshot are not handled
+            assert (
+                cls.initialize("10.5281/zenodo.2", "https://zenodo.org/records/2")
+                is None
+            )
+
+        assert m.call_count == 0
+
+
+def test_snapshot_cli(tmp_path):
+    path = tmp_path / "snapshot.json"
+    records = tmp_path / "records.txt"
+    records.write_text(f"{ZenodoTestRecord.doi} {ARCHIVE_URL}\n")
+
+    with requests_mock.Mocker() as m:
+        mock_record(m)
+        assert main(["snapshot", "-f", str(records), "-o", str(path)]) == 0
+        assert (
+            main(
+                [
+                    "snapshot",
+                    "10.5281/zenodo.1 https://zenodo.org/records/1",
+                    "-o",
+                    str(path),
+                ]
+            )
+            == 1
+        )
+
+    assert len(MetadataSnapshot(path)) == 1
+
+
+def test_resolve_doi():
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://doi.org/10.5281/zenodo.1",
+            status_code=302,
+            headers={"Location": "https://zenodo.org/record/1"},
+        )
+        m.get(
+            "https://zenodo.org/record/1",
+            status_code=301,
+            headers={"Location": "/records/1"},
+        )
+        assert resolve_doi("10.5281/zenodo.1") == "https://zenodo.org/records/1"
+        # The redirect to the archive URL itself is not followed
+        assert len(m.request_history) == 2
+        assert all(not r.allow_redirects for r in m.request_history)
+
+        m.get("https://doi.org/10.5281/zenodo.2", status_code=404)
+        with pytest.raises(requests.HTTPError):
+            resolve_doi("10.5281/zenodo.2")
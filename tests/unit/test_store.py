@@ -0,0 +1,90 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests_mock
+
+from pooch_invenio import ContentStore, InvenioRDMRepository
+
+CONTENT = b"shared content"
+CHECKSUM = f"md5:{hashlib.md5(CONTENT).hexdigest()}"
+
+
+def test_content_store(tmp_path):
+    store = ContentStore(tmp_path / "store")
+    assert CHECKSUM not in store
+    assert store.get(CHECKSUM) is None
+
+    source = tmp_path / "file.txt"
+    source.write_bytes(CONTENT)
+    path = store.add(CHECKSUM, source)
+    assert CHECKSUM in store
+    assert store.get(CHECKSUM) == path
+    assert path.samefile(source)
+
+    # Adding the same content again leaves the stored file untouched
+    other = tmp_path / "other.txt"
+    other.write_bytes(CONTENT)
+    assert store.add(CHECKSUM, other) == path
+    assert path.samefile(source)
+
+    store.clear()
+    assert CHECKSUM not in store
+
+    with pytest.raises(ValueError, match="Invalid checksum"):
+        store.get("md5:../../etc")
+
+
+def test_content_store_concurrent_add(tmp_path):
+    store = ContentStore(tmp_path / "store")
+    sources = []
+    for i in range(8):
+        sources.append(tmp_path / f"file{i}.txt")
+        sources[-1].write_bytes(CONTENT)
+
+    for _ in range(200):
+        store.clear()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = set(executor.map(lambda p: store.add(CHECKSUM, p), sources))
+        (path,) = paths
+        assert path.read_bytes() == CONTENT
+        assert list(path.parent.iterdir()) == [path]
+
+
+def test_content_store_dedup(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        InvenioRDMRepository, "content_store", ContentStore(tmp_path / "store")
+    )
+
+    with requests_mock.Mocker() as m:
+        for record_id in ("1", "2"):
+            content_url = (
+                f"https://zenodo.org/api/records/{record_id}/files/a.txt/content"
+            )
+            m.get(
+                f"https://zenodo.org/api/records/{record_id}/files",
+                json={
+                    "entries": [
+                        {
+                            "key": "a.txt",
+                            "checksum": CHECKSUM,
+                            "size": len(CONTENT),
+                            "links": {"content": content_url},
+                        }
+                    ]
+                },
+            )
+            m.get(content_url, content=CONTENT)
+
+        first = InvenioRDMRepository.initialize("doi1", "https://zenodo.org/records/1")
+        second = InvenioRDMRepository.initialize("doi2", "https://zenodo.org/records/2")
+
+        first.download_files(tmp_path / "1")
+        m.reset_mock()
+        paths = second.download_files(tmp_path / "2")
+        assert m.call_count == 0
+
+    assert paths["a.txt"].read_bytes() == CONTENT
+    assert paths["a.txt"].samefile(tmp_path / "1" / "a.txt")
+    assert os.stat(paths["a.txt"]).st_nlink == 3